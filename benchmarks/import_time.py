@@ -0,0 +1,92 @@
+#
+# Copyright 2021 Bernhard Walter
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Import time benchmark
+
+Every module is imported in a fresh interpreter. The script fails if a headless module cannot be imported,
+pulls in the widget stack or takes longer than its budget (scaled by factor, e.g. for slow CI machines).
+
+Usage: python benchmarks/import_time.py [repeats [factor]]
+"""
+
+import subprocess
+import sys
+
+WIDGET_MODULES = ("ipywidgets", "pythreejs", "jupyter_cadquery_widgets")
+
+# module, must stay free of the widget stack, import time budget in seconds (None: not checked)
+# cadquery and OCP alone need about a second to import
+MODULES = [
+    ("jupyter_cadquery", True, 0.2),
+    ("jupyter_cadquery.serialize", True, 0.5),
+    ("jupyter_cadquery.cad_objects", True, 3.0),
+    ("jupyter_cadquery.cadquery", True, 3.0),
+    ("jupyter_cadquery.viewer.client", True, 3.0),
+    ("jupyter_cadquery.cad_display", False, None),
+]
+
+SCRIPT = """
+import sys, time
+t = time.perf_counter()
+import {module}
+t = time.perf_counter() - t
+print(t, ",".join(m for m in {widget_modules} if m in sys.modules))
+"""
+
+
+def measure(module):
+    script = SCRIPT.format(module=module, widget_modules=WIDGET_MODULES)
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+    if result.returncode != 0:
+        return None, result.stderr.strip().split("\n")[-1]
+
+    duration, _, loaded = result.stdout.strip().partition(" ")
+    return float(duration), loaded
+
+
+def main(repeats=3, factor=1.0):
+    failed = False
+    for module, headless, budget in MODULES:
+        timings = []
+        for _ in range(repeats):
+            duration, loaded = measure(module)
+            if duration is None:
+                break
+            timings.append(duration)
+
+        if not timings:
+            # the headless modules are the ones that have to work without the widget stack
+            status = "FAIL: " if headless else ""
+            failed = failed or headless
+            print(f"{module:35s}    n/a     {status}({loaded})")
+            continue
+
+        status = ""
+        if headless and loaded:
+            status = f"FAIL: imports {loaded}"
+            failed = True
+        elif budget is not None and min(timings) > budget * factor:
+            status = f"FAIL: budget {budget * factor:.3f} sec"
+            failed = True
+        print(f"{module:35s} {min(timings):7.3f} sec {status}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    factor = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    sys.exit(main(repeats, factor))
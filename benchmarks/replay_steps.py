@@ -0,0 +1,71 @@
+#
+# Copyright 2021 Bernhard Walter
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Replay step reconstruction benchmark
+
+Traces a synthetic modeling history of n steps (a chain of cheap workplane operations) and measures how long
+replay needs to rebuild and format the step list.
+
+Usage: python benchmarks/replay_steps.py [steps]
+"""
+
+from importlib import import_module
+import sys
+import time
+
+import cadquery as cq
+
+# the package exports the replay function under the same name as the module
+replay = import_module("jupyter_cadquery.cadquery.replay")
+
+
+def model(n):
+    result = cq.Workplane("XY")
+    for i in range(n):
+        result = result.center(1, 0) if i % 2 == 0 else result.center(0, 1)
+    return result
+
+
+def main(n=10000):
+    replay.DEBUG = False
+    replay.wrap_workplane()
+    try:
+        t = time.perf_counter()
+        workplane = model(n)
+        traced = time.perf_counter() - t
+    finally:
+        replay.unwrap_workplane()
+
+    # building the steps does not need the widgets of a Replay object
+    r = object.__new__(replay.Replay)
+
+    t = time.perf_counter()
+    raw_steps = r.to_array(workplane)
+    to_array = time.perf_counter() - t
+
+    t = time.perf_counter()
+    steps = r.format_steps(raw_steps)
+    format_steps = time.perf_counter() - t
+
+    print(f"steps:        {len(steps):7d}")
+    print(f"traced model: {traced:7.3f} sec")
+    print(f"to_array:     {to_array:7.3f} sec")
+    print(f"format_steps: {format_steps:7.3f} sec")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000))
@@ -0,0 +1,71 @@
+#
+# Copyright 2021 Bernhard Walter
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Replay tracing benchmark
+
+Runs the same CadQuery modeling code untraced and with replay tracing enabled and reports the slowdown.
+
+Usage: python benchmarks/replay_tracing.py [repeats]
+"""
+
+from importlib import import_module
+import sys
+import time
+
+import cadquery as cq
+
+# the package exports the replay function under the same name as the module
+replay = import_module("jupyter_cadquery.cadquery.replay")
+
+
+def model(n=8):
+    result = cq.Workplane("XY").box(10 * n, 10, 2)
+    for i in range(n):
+        pin = cq.Workplane("XY").center(10 * i - 5 * (n - 1), 0).circle(2).extrude(6)
+        result = result.union(pin)
+    result = result.faces(">Z").edges().fillet(0.2)
+    return result.faces("<Z").workplane().rect(5, 5, forConstruction=True).vertices().hole(1)
+
+
+def measure(repeats):
+    timings = []
+    for _ in range(repeats):
+        t = time.perf_counter()
+        model()
+        timings.append(time.perf_counter() - t)
+    return min(timings)
+
+
+def main(repeats=5):
+    measure(1)  # warm up OCC
+
+    untraced = measure(repeats)
+
+    replay.DEBUG = False
+    replay.wrap_workplane()
+    try:
+        traced = measure(repeats)
+    finally:
+        replay.unwrap_workplane()
+
+    print(f"untraced: {untraced:7.3f} sec")
+    print(f"traced:   {traced:7.3f} sec")
+    print(f"slowdown: {traced / untraced:7.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5))
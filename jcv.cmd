@@ -3,12 +3,14 @@
 set ZMQ_PORT=
 set CAD_HEIGHT=
 set CAD_WIDTH=
+set SCENE_DIR=
 set THEME=light
 
 :GETOPTS
 if /I "%1" == "-p" set ZMQ_PORT=%2 & shift
 if /I "%1" == "-h" set CAD_HEIGHT=%2 & shift
 if /I "%1" == "-w" set CAD_WIDTH=%2 & shift
+if /I "%1" == "-s" set SCENE_DIR=%2 & shift
 if /I "%1" == "-d" set THEME=dark
 shift
 if not "%1" == "" goto GETOPTS
@@ -16,16 +16,38 @@
 
 from ._version import __version_info__, __version__
 
-from .cad_display import (
-    set_sidecar,
-    reset_sidecar,
-    has_sidecar,
-    close_sidecar,
-)
-
 from .defaults import (
     get_default,
     get_defaults,
     set_defaults,
     reset_defaults,
-)
\ No newline at end of file
+)
+
+#
+# The widget stack (ipywidgets, pythreejs, jupyter_cadquery_widgets) is only imported when a display is needed.
+# This keeps "import jupyter_cadquery" and the headless tessellation path (e.g. viewer.client) fast
+#
+
+
+def set_sidecar(title, init=False):
+    from .cad_display import set_sidecar as _set_sidecar
+
+    return _set_sidecar(title, init)
+
+
+def reset_sidecar(init=True):
+    from .cad_display import reset_sidecar as _reset_sidecar
+
+    return _reset_sidecar(init)
+
+
+def has_sidecar():
+    from .cad_display import has_sidecar as _has_sidecar
+
+    return _has_sidecar()
+
+
+def close_sidecar():
+    from .cad_display import close_sidecar as _close_sidecar
+
+    return _close_sidecar()
@@ -15,7 +15,6 @@
 #
 
 import numpy as np
-from pyquaternion import Quaternion
 from pythreejs import (
     NumberKeyframeTrack,
     AnimationAction,
@@ -23,30 +22,161 @@ from pythreejs import (
     AnimationMixer,
     QuaternionKeyframeTrack,
 )
+from jupyter_cadquery.utils import tree_index
 from jupyter_cadquery.viewer.client import send
 
+#
+# Quaternions are arrays in threejs order (x, y, z, w), all functions work on stacks of quaternions
+#
+
+
+def _quat_multiply(q, r):
+    """Hamilton products q * r, broadcasting over all but the last axis"""
+    x1, y1, z1, w1 = np.moveaxis(np.asarray(q, dtype=np.float64), -1, 0)
+    x2, y2, z2, w2 = np.moveaxis(np.asarray(r, dtype=np.float64), -1, 0)
+    return np.stack(
+        (
+            w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2,
+            w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2,
+            w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2,
+            w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2,
+        ),
+        axis=-1,
+    )
+
+
+def _from_axis_angle(axis, angles):
+    """Rotations around axis by angles (in degrees)"""
+    axis = np.asarray(axis, dtype=np.float64)
+    half = np.radians(np.asarray(angles, dtype=np.float64)) / 2
+    quats = np.empty(half.shape + (4,))
+    quats[..., :3] = np.sin(half)[..., None] * (axis / np.linalg.norm(axis))
+    quats[..., 3] = np.cos(half)
+    return quats
+
+
+def _slerp(q1, q2, u):
+    """Spherical interpolation from q1 to q2 at the fractions u, along the shorter arc as threejs does"""
+    dot = np.dot(q1, q2)
+    if dot < 0:
+        q2, dot = -q2, -dot
+    theta = np.arccos(min(dot, 1.0))
+    if theta < 1e-6:
+        quats = q1 + u[:, None] * (q2 - q1)
+    else:
+        quats = (np.sin((1 - u) * theta)[:, None] * q1 + np.sin(u * theta)[:, None] * q2) / np.sin(theta)
+    return quats / np.linalg.norm(quats, axis=1)[:, None]
+
+
+def _fractions(times, i, j):
+    span = times[j] - times[i]
+    if span <= 0:
+        return np.zeros(j - i - 1)
+    return (times[i + 1 : j] - times[i]) / span
+
+
+#
+# Keyframe reduction
+#
+
+# cos of the half angle of a 170 degree rotation
+_MIN_SLERP_DOT = np.cos(np.radians(85))
+
+
+def _reduce(times, tolerance, errors):
+    """Indices of the keyframes to keep, errors(i, j) are the interpolation errors of the keyframes i+1 .. j-1
+
+    Ramer-Douglas-Peucker over time: the keyframe with the largest error between two kept keyframes is kept
+    as long as this error exceeds the tolerance.
+    """
+    n = len(times)
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, n - 1]] = True
+    segments = [(0, n - 1)]
+    while segments:
+        i, j = segments.pop()
+        if j - i < 2:
+            continue
+        err = errors(i, j)
+        k = int(np.argmax(err))
+        if err[k] > tolerance:
+            k += i + 1
+            keep[k] = True
+            segments += [(i, k), (k, j)]
+    return np.flatnonzero(keep)
 
-def _three_to_pyquat(quat):
-    return Quaternion(quat[3], *quat[:3])
 
+def reduce_linear(times, values, tolerance):
+    """Keyframes to keep so that linear interpolation reproduces values (n or (n, d)) within tolerance"""
+    values = np.asarray(values, dtype=np.float64).reshape(len(times), -1)
 
-def _pyquat_to_three(quat):
-    return (quat.x, quat.y, quat.z, quat.w)
+    def errors(i, j):
+        interpolated = values[i] + _fractions(times, i, j)[:, None] * (values[j] - values[i])
+        return np.linalg.norm(interpolated - values[i + 1 : j], axis=1)
 
+    return _reduce(times, tolerance, errors)
 
-def _from_axis_angle(axis, angle):
-    return Quaternion(axis=axis, degrees=angle)
+
+def reduce_slerp(times, quats, tolerance):
+    """Keyframes to keep so that slerp reproduces the quaternions (n, 4) within tolerance (in degrees)"""
+    quats = np.asarray(quats, dtype=np.float64)
+    quats = quats / np.linalg.norm(quats, axis=1)[:, None]
+
+    def errors(i, j):
+        # near 180 degrees the shorter arc is ambiguous, so such segments are always split in the middle
+        if abs(np.dot(quats[i], quats[j])) < _MIN_SLERP_DOT:
+            err = np.zeros(j - i - 1)
+            err[(j - i) // 2 - 1] = np.inf
+            return err
+        interpolated = _slerp(quats[i], quats[j], _fractions(times, i, j))
+        dots = np.abs(np.sum(interpolated * quats[i + 1 : j], axis=1))
+        return np.degrees(2 * np.arccos(np.minimum(dots, 1.0)))
+
+    return _reduce(times, tolerance, errors)
 
 
 valid_transforms = ["t", "tx", "ty", "tz", "q", "rx", "ry", "rz"]
 
+_axes = {"x": 0, "y": 1, "z": 2}
+
 
 class AnimationException(BaseException):
     ...
 
 
+def _assembly_paths(assembly):
+    """id -> path in the navigation tree (e.g. "base/disk") of the assembly and all its children"""
+    paths = {}
+    stack = [(assembly, assembly.name)]
+    while stack:
+        assy, path = stack.pop()
+        paths[id(assy)] = path
+        stack.extend((child, f"{path}/{child.name}") for child in assy.children)
+    return paths
+
+
+def _joint_path(assembly, paths, joint):
+    """Path of a joint given as path, mate name or (child) assembly object"""
+    if isinstance(joint, str):
+        if joint in paths.values():
+            return joint
+        mates = getattr(assembly, "mates", None) or {}
+        if joint in mates:
+            return paths[id(mates[joint].assembly)]
+    elif id(joint) in paths:
+        return paths[id(joint)]
+    raise AnimationException(f"joint '{joint}' not found in assembly '{assembly.name}'")
+
+
 class Animation:
-    def __init__(self, root=None, viewer=False):
+    """Keyframe animation of the groups of an assembly
+
+    With position_tolerance and/or angle_tolerance (in degrees) given, keyframes that the linear (translations)
+    or spherical (rotations) interpolation of the remaining keyframes reproduces within the tolerance are
+    dropped before the tracks are built or sent to the viewer
+    """
+
+    def __init__(self, root=None, viewer=False, position_tolerance=None, angle_tolerance=None):
         if viewer and root is not None:
             print("Viewer can only animate last root, so parameter has to be None")
         elif not viewer and root is None:
@@ -55,71 +185,147 @@ class Animation:
         self.viewer = viewer
         self.root = root
         self.tracks = []
+        self._groups = None
+        self.position_tolerance = position_tolerance
+        self.angle_tolerance = angle_tolerance
+        self.keyframes = {"original": 0, "kept": 0}
+
+    def find_group(self, selector):
+        """Group with name selector, the name index of the root is built on first use"""
+        if self._groups is None:
+            self._groups = tree_index(self.root)
+        return self._groups.get(selector)
+
+    def _reduce(self, action, times, values):
+        times = np.asarray(times, dtype=np.float64)
+        if action.startswith("t") and self.position_tolerance is not None:
+            keep = reduce_linear(times, values, self.position_tolerance)
+        elif action in ("rx", "ry", "rz") and self.angle_tolerance is not None:
+            axis = np.zeros(3)
+            axis[_axes[action[1]]] = 1
+            keep = reduce_slerp(times, _from_axis_angle(axis, values), self.angle_tolerance)
+        elif action == "q" and self.angle_tolerance is not None:
+            keep = reduce_slerp(times, values, self.angle_tolerance)
+        else:
+            keep = np.arange(len(times))
+
+        self.keyframes["original"] += len(times)
+        self.keyframes["kept"] += len(keep)
+        return times[keep], np.asarray(values)[keep]
 
     def add_track(self, selector, action, times, values):
 
+        if len(times) != len(values):
+            raise AnimationException("times and values arrays need have the same lenght")
+
+        if len(times) > 2 and (self.position_tolerance is not None or self.angle_tolerance is not None):
+            times, values = self._reduce(action, times, values)
+
         if self.viewer:
             self.tracks.append((selector, action, times, values))
             return
 
-        if len(times) != len(values):
-            raise AnimationException("times and values arrays need have the same lenght")
-
         selector = selector.replace("/", "\\")
-        group = self.root.find_group(selector)
+        group = self.find_group(selector)
         if group is None:
             raise AnimationException(f"group '{selector}' not found")
 
+        times = np.asarray(times, dtype=np.float32)
+        values = np.asarray(values, dtype=np.float64)
+
         if action.startswith("t"):
-            position = np.array(group.position).astype(np.float32)
+            position = np.asarray(group.position, dtype=np.float64)
             if action == "t":
-                new_values = [position + v for v in values]
-            elif action == "tx":
-                new_values = [position + (v, 0, 0) for v in values]
-            elif action == "ty":
-                new_values = [position + (0, v, 0) for v in values]
-            elif action == "tz":
-                new_values = [position + (0, 0, v) for v in values]
+                new_values = position + values.reshape(-1, 3)
+            elif action in ("tx", "ty", "tz"):
+                new_values = np.tile(position, (len(values), 1))
+                new_values[:, _axes[action[1]]] += values
             else:
                 raise AnimationException(f"action {action} is not supported")
 
             self.tracks.append(
                 NumberKeyframeTrack(
                     name=selector + ".position",
-                    times=np.array(times).astype(np.float32),
-                    values=new_values,
+                    times=times,
+                    values=new_values.astype(np.float32),
                 )
             )
 
         else:
-            if action.startswith("r"):
-                actual = _three_to_pyquat(group.quaternion)
-                if action == "rx":
-                    rot_values = [_from_axis_angle([1, 0, 0], v) for v in values]
-                elif action == "ry":
-                    rot_values = [_from_axis_angle([0, 1, 0], v) for v in values]
-                elif action == "rz":
-                    rot_values = [_from_axis_angle([0, 0, 1], v) for v in values]
-                else:
-                    raise AnimationException(f"action {action} not supported")
-                new_values = [_pyquat_to_three(actual * rot) for rot in rot_values]
+            if action in ("rx", "ry", "rz"):
+                axis = np.zeros(3)
+                axis[_axes[action[1]]] = 1
+                rotations = _from_axis_angle(axis, values)
 
             elif action == "q":
-                actual = _three_to_pyquat(group.quaternion)
-                new_values = [_pyquat_to_three(actual * _three_to_pyquat(q)) for q in values]
+                rotations = values.reshape(-1, 4)
 
             else:
                 raise AnimationException(f"action {action} is not supported")
 
+            new_values = _quat_multiply(group.quaternion, rotations)
+
             self.tracks.append(
                 QuaternionKeyframeTrack(
                     name=selector + ".quaternion",
-                    times=np.array(times).astype(np.float32),
-                    values=new_values,
+                    times=times,
+                    values=new_values.astype(np.float32),
                 )
             )
 
+    def bake(self, assembly, times, joints):
+        """Batched track creation from caller supplied poses of the joints of an MAssembly
+
+        joints(times) is called once with the whole time axis and returns {joint: {action: values}}. A joint is
+        a path like "base/disk", a mate name or a child assembly and is only used to find the group to animate,
+        no transforms are derived from the mates. Values are arrays over times (scalars broadcast), several
+        translations or rotations of one joint are combined into one track each.
+        """
+        times = np.asarray(times, dtype=np.float64)
+        n = len(times)
+        paths = _assembly_paths(assembly)
+
+        for joint, transforms in joints(times).items():
+            path = _joint_path(assembly, paths, joint)
+            translations = []
+            rotations = []
+            for action, values in transforms.items():
+                if action not in valid_transforms:
+                    raise AnimationException(f"action {action} is not supported")
+                shape = (n, 3) if action == "t" else (n, 4) if action == "q" else (n,)
+                values = np.array(np.broadcast_to(np.asarray(values, dtype=np.float64), shape))
+                (translations if action.startswith("t") else rotations).append((action, values))
+
+            if len(translations) == 1:
+                action, values = translations[0]
+                self.add_track(path, action, times, values)
+            elif translations:
+                offsets = np.zeros((n, 3))
+                for action, values in translations:
+                    if action == "t":
+                        offsets += values
+                    else:
+                        offsets[:, _axes[action[1]]] += values
+                self.add_track(path, "t", times, offsets)
+
+            if len(rotations) == 1:
+                action, values = rotations[0]
+                self.add_track(path, action, times, values)
+            elif rotations:
+                quats = np.array((0.0, 0.0, 0.0, 1.0))
+                for action, values in rotations:
+                    if action != "q":
+                        axis = np.zeros(3)
+                        axis[_axes[action[1]]] = 1
+                        values = _from_axis_angle(axis, values)
+                    quats = _quat_multiply(quats, values)
+                self.add_track(path, "q", times, quats)
+
     def animate(self, speed=1, autoplay=False):
+        if self.keyframes["original"] > 0:
+            original, kept = self.keyframes["original"], self.keyframes["kept"]
+            print(f"Keyframes reduced from {original} to {kept} ({100 * (1 - kept / original):.1f}% dropped)")
+
         if self.viewer:
             data = {"tracks": self.tracks, "type": "animation", "speed": speed, "autoplay": autoplay}
             send(data)
@@ -14,20 +14,18 @@
 # limitations under the License.
 #
 
-import base64
 from os.path import join, dirname
-import pickle
 from uuid import uuid4
 from IPython.display import display as ipy_display
 
-from ipywidgets import Label, Checkbox, Layout, HBox, VBox, Box, FloatSlider, Tab, HTML, Box, Output
+from ipywidgets import Label, Checkbox, Layout, HBox, VBox, Box, FloatSlider, Tab, HTML, Box, Output, Widget
 
-from jupyter_cadquery_widgets.widgets import ImageButton, TreeView, UNSELECTED, SELECTED, MIXED, EMPTY
+from jupyter_cadquery_widgets.widgets import ImageButton, TreeView, UNSELECTED, SELECTED, MIXED, EMPTY, state_diff
 from .cad_view import CadqueryView
 from .utils import Timer, Progress, px
 from ._version import __version__
 from .defaults import set_defaults, get_default, split_args
-from .logo import LOGO_DATA
+from .logo import get_logo
 from .style import set_css
 
 DISPLAY = None
@@ -104,15 +102,16 @@ def get_or_create_display(init=False, **kwargs):
         with SIDECAR:
             ipy_display(widget)
 
-        data = pickle.loads(base64.b64decode(LOGO_DATA))
-        mesh_data = data["data"]
-        config = data["config"]
-        DISPLAY.init_progress(data.get("count", 1))
-        create_args, add_shape_args = split_args(config)
-        DISPLAY._update_settings(**create_args)
-        DISPLAY.add_shapes(**mesh_data, **add_shape_args)
-        DISPLAY.info.ready_msg(DISPLAY.cq_view.grid.step)
-        DISPLAY.splash = True
+        data = get_logo()
+        if data is not None:
+            mesh_data = data["data"]
+            config = data["config"]
+            DISPLAY.init_progress(data.get("count", 1))
+            create_args, add_shape_args = split_args(config)
+            DISPLAY._update_settings(**create_args)
+            DISPLAY.add_shapes(**mesh_data, **add_shape_args)
+            DISPLAY.info.ready_msg(DISPLAY.cq_view.grid.step)
+            DISPLAY.splash = True
         set_css(get_default("theme"), True)
 
     else:
@@ -466,6 +465,14 @@ class CadqueryDisplay(object):
         self.black_edges = self.bool_or_new(change)
         self.cq_view.set_black_edges(self.black_edges)
 
+    def change_visibility(self, change):
+        # only the leaves that changed are forwarded to the view
+        changes = []
+        for diff in state_diff(change["old"], change["new"]):
+            [[key, value]] = diff.items()
+            changes.append((self.paths[key], value["icon"], value["new"]))
+        self.cq_view.set_visibilities(changes)
+
     def toggle_clipping(self, change):
         if change["name"] == "selected_index":
             self.cq_view.set_clipping(change["new"])
@@ -694,8 +701,7 @@ class CadqueryDisplay(object):
         self.states = {k: v["state"] for k, v in mapping.items()}
         self.paths = {k: v["path"] for k, v in mapping.items()}
 
-        self.tree_view = Output()
-        self.tree_clipping.children = [self.tree_view, self.tree_clipping.children[1]]
+        self._replace_tree_view(Output())
 
         # Force reset of camera to inhereit splash settings for first object
         if self.splash:
@@ -734,25 +740,25 @@ class CadqueryDisplay(object):
             set_slider(5, bb.zmin, bb.zmax)
 
             # Tree widget to change visibility
-            self.tree_view = TreeView(
+            tree_view = TreeView(
                 image_paths=self.image_paths,
                 tree=tree,
                 state=self.states,
                 layout=Layout(height=px(self._tree_height(self.height)), width=px(self.tree_width - 20)),
             )
-            self.tree_view.add_class("view_tree")
-            self.tree_view.add_class("scroll-area")
+            tree_view.add_class("view_tree")
+            tree_view.add_class("scroll-area")
             if self.mac_scrollbar:
-                self.tree_view.add_class("mac-scrollbar")
+                tree_view.add_class("mac-scrollbar")
 
-            self.tree_view.observe(self.cq_view.change_visibility(self.paths), "state")
-            self.tree_clipping.children = [self.tree_view, self.tree_clipping.children[1]]
+            tree_view.observe(self.change_visibility, "state")
+            self._replace_tree_view(tree_view)
 
             # Set initial state
 
-            for obj, vals in self.states.items():
-                for i, val in enumerate(vals):
-                    self.cq_view.set_visibility(self.paths[obj], i, val)
+            self.cq_view.set_visibilities(
+                [(self.paths[obj], i, val) for obj, vals in self.states.items() for i, val in enumerate(vals)]
+            )
 
             self._set_checkboxes()
             self.toggle_axes(self.axes)
@@ -770,10 +776,23 @@ class CadqueryDisplay(object):
             self.info.clear()
 
             # clear tree
-            self.tree_clipping.children = [Output(), self.tree_clipping.children[1]]
+            self._replace_tree_view(Output())
 
             self.clean = True
 
+    def _replace_tree_view(self, tree_view):
+        old_tree_view = self.tree_clipping.children[0]
+        self.tree_view = tree_view
+        self.tree_clipping.children = [tree_view, self.tree_clipping.children[1]]
+        if old_tree_view is not tree_view:
+            old_tree_view.close()
+
+    def widget_stats(self):
+        """Live widget count and approximate buffer bytes of the current scene of this display"""
+        stats = self.cq_view.widget_stats()
+        stats["live_widgets"] = len(Widget.widgets)
+        return stats
+
     def display(self, widget):
         if self._display == "cell" or SIDECAR is None:
             ipy_display(widget)
@@ -63,14 +63,28 @@ class Helpers(object):
 class Grid(Helpers):
     def __init__(self, bb_center=None, maximum=5, ticks=10, colorCenterLine="#aaa", colorGrid="#ddd"):
         super().__init__(bb_center)
+        self.colorCenterLine = colorCenterLine
+        self.colorGrid = colorGrid
+        self.grid = None
+        self.update(bb_center, maximum, ticks)
+
+    def update(self, bb_center, maximum, ticks=10):
+        """Re-parameterize the grid for a new bounding box
+
+        The GridHelper widget is only replaced when size or number of divisions change
+        """
+        self.bb_center = bb_center
         self.maximum = maximum
         axis_start, axis_end, nice_tick = self.nice_bounds(-maximum, maximum, 2 * ticks)
         self.step = nice_tick
         self.size = axis_end - axis_start
-        self.grid = GridHelper(
-            self.size, int(self.size / self.step), colorCenterLine=colorCenterLine, colorGrid=colorGrid
-        )
-        self.set_center(True)
+        divisions = int(self.size / self.step)
+
+        if self.grid is None or self.grid.size != self.size or self.grid.divisions != divisions:
+            self.grid = GridHelper(
+                self.size, divisions, colorCenterLine=self.colorCenterLine, colorGrid=self.colorGrid
+            )
+        self.set_center(self.zero)
 
     # https://stackoverflow.com/questions/4947682/intelligently-calculating-chart-tick-positions
     def _nice_number(self, value, round_=False):
@@ -131,7 +145,7 @@ class Axes(Helpers):
         super().__init__(bb_center)
 
         self.axes = []
-        for vector, color in zip(([length, 0, 0], [0, length, 0], [0, 0, length]), ("red", "green", "blue")):
+        for vector, color in zip(self._vectors(length), ("red", "green", "blue")):
             self.axes.append(
                 LineSegments2(
                     LineSegmentsGeometry(positions=[[self.center, self._shift(self.center, vector)]]),
@@ -139,6 +153,15 @@ class Axes(Helpers):
                 )
             )
 
+    def update(self, bb_center, length=1):
+        self.bb_center = bb_center
+        for axis, vector in zip(self.axes, self._vectors(length)):
+            axis.geometry.positions = [[self.center, self._shift(self.center, vector)]]
+        self.set_center(self.zero)
+
+    def _vectors(self, length):
+        return ([length, 0, 0], [0, length, 0], [0, 0, length])
+
     def _shift(self, v, offset):
         return [x + o for x, o in zip(v, offset)]
 
@@ -14,14 +14,13 @@
 # limitations under the License.
 #
 
+import itertools
+import os
+import sys
+
+import numpy as np
 from cadquery import Compound, __version__
 
-from jupyter_cadquery.cad_display import (
-    get_default,
-    get_or_create_display,
-    has_sidecar,
-)
-from jupyter_cadquery_widgets.widgets import UNSELECTED, SELECTED, EMPTY
 from jupyter_cadquery.utils import Color, flatten, Timer, warn
 from jupyter_cadquery.ocp_utils import bounding_box, get_point, BoundingBox, loc_to_tq
 from jupyter_cadquery.tessellator import discretize_edge, tessellate, compute_quality
@@ -29,6 +28,23 @@ from jupyter_cadquery.defaults import get_default, split_args
 
 PART_ID = 0
 
+# Tree states as defined in jupyter_cadquery_widgets.widgets. They are repeated here so that
+# tessellation does not need to import the widget stack
+UNSELECTED = 0
+SELECTED = 1
+MIXED = 2
+EMPTY = 3
+
+
+
+def _tessellation_service():
+    # The service client (and zmq) is only imported if a service is configured, either by environment
+    # variable or by calling set_service, which has imported the client already
+    client = sys.modules.get("jupyter_cadquery.service.client")
+    if client is None and os.environ.get("JCQ_TESSELLATION_SERVICE") is not None:
+        from jupyter_cadquery.service import client
+    return None if client is None or client.SERVICE is None else client
+
 
 #
 # Simple Part and PartGroup classes
@@ -107,8 +123,9 @@ class _Part(_CADObject):
 
         normals_len = 0 if render_normals is False else quality / deviation * 5
 
+        service = _tessellation_service()
         with Timer(timeit, self.name, "tessellate:     ", 2) as t:
-            mesh = tessellate(
+            mesh = (tessellate if service is None else service.tessellate)(
                 self.shape,
                 quality=quality,
                 angular_tolerance=angular_tolerance,
@@ -118,9 +135,15 @@ class _Part(_CADObject):
             )
             t.info = f"{{quality:{quality:.4f}, angular_tolerance:{angular_tolerance:.2f}}}"
 
-        # After meshing the non optimal bounding box is much more exact
+        # After meshing the non optimal bounding box is much more exact.
+        # The shapes sent to the service are not meshed locally, their box is taken from the mesh vertices
         with Timer(timeit, self.name, "bounding box:   ", 2) as t:
-            bb2 = bounding_box(self.shape, loc=loc, optimal=False)
+            if service is None:
+                bb2 = bounding_box(self.shape, loc=loc, optimal=False)
+            elif len(mesh["vertices"]) > 0:
+                bb2 = _array_bounding_box(mesh["vertices"], loc)
+            else:
+                bb2 = BoundingBox(bb)
             bb2.update(bb, minimize=True)
             t.info = str(bb2)
 
@@ -263,6 +286,225 @@ class _Vertices(_CADObject):
         }
 
 
+def voxel_decimate(points, voxel_size):
+    """Indices (ascending) of the first point in every occupied voxel of edge length voxel_size"""
+    cells = np.floor((points - points.min(axis=0)) / voxel_size).astype(np.int64)
+    dims = cells.max(axis=0) + 1
+    if np.prod(dims.astype(np.float64)) < 2 ** 62:
+        keys = (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]
+        _, index = np.unique(keys, return_index=True)
+    else:
+        _, index = np.unique(cells, axis=0, return_index=True)
+    return np.sort(index)
+
+
+def _rotate(vectors, quaternion):
+    x, y, z, w = quaternion
+    q = np.array((x, y, z))
+    t = 2 * np.cross(q, vectors)
+    return vectors + w * t + np.cross(q, t)
+
+
+def _array_bounding_box(positions, loc=None):
+    lower, upper = positions.min(axis=0).astype(np.float64), positions.max(axis=0).astype(np.float64)
+    if loc is not None:
+        t, q = loc_to_tq(loc)
+        corners = _rotate(np.array(list(itertools.product(*zip(lower, upper)))), q) + t
+        lower, upper = corners.min(axis=0), corners.max(axis=0)
+    (xmin, ymin, zmin), (xmax, ymax, zmax) = lower.tolist(), upper.tolist()
+    return BoundingBox({"xmin": xmin, "xmax": xmax, "ymin": ymin, "ymax": ymax, "zmin": zmin, "zmax": zmax})
+
+
+def _colors(colors, shape):
+    colors = np.asarray(colors)
+    if colors.shape != shape:
+        raise ValueError(f"colors need to have shape {shape}, not {colors.shape}")
+    if np.issubdtype(colors.dtype, np.integer):
+        colors = colors / 255
+    return colors
+
+
+def compute_normals(vertices, triangles):
+    """Area weighted vertex normals of a triangle mesh (vertices (n, 3), triangles (m, 3) or flat)"""
+    faces = np.asarray(triangles).reshape(-1, 3)
+    v0, v1, v2 = (vertices[faces[:, i]].astype(np.float64) for i in range(3))
+    # the length of the cross product is twice the triangle area
+    face_normals = np.cross(v1 - v0, v2 - v0)
+    corners = faces.ravel()
+    normals = np.column_stack(
+        [np.bincount(corners, weights=np.repeat(face_normals[:, i], 3), minlength=len(vertices)) for i in range(3)]
+    )
+    lengths = np.linalg.norm(normals, axis=1)
+    lengths[lengths == 0] = 1
+    return (normals / lengths[:, None]).astype(np.float32)
+
+
+class _Mesh(_CADObject):
+    """Triangle mesh given as numpy arrays, rendered without OCC
+
+    vertices: array (n, 3), triangles: vertex indices (m, 3) or flat
+    normals: optional vertex normals (n, 3), computed from the triangles if missing
+    colors: optional per vertex colors (n, 3), floats in [0, 1] or integers in [0, 255]
+    """
+
+    def __init__(self, vertices, triangles, name="Mesh", color=None, normals=None, colors=None, show_faces=True):
+        super().__init__()
+        self.name = name
+        self.id = self.next_id()
+        self.state_faces = SELECTED if show_faces else UNSELECTED
+
+        vertices = np.ascontiguousarray(vertices, dtype=np.float32)
+        if vertices.ndim != 2 or vertices.shape[1] != 3 or len(vertices) == 0:
+            raise ValueError(f"vertices need to be a non empty array of shape (n, 3), not {vertices.shape}")
+
+        triangles = np.asarray(triangles)
+        if triangles.size % 3 != 0 or (triangles.ndim == 2 and triangles.shape[1] != 3):
+            raise ValueError(f"triangles need to be an array of shape (m, 3), not {triangles.shape}")
+        triangles = np.ascontiguousarray(triangles, dtype=np.uint32).ravel()
+        if triangles.size > 0 and triangles.max() >= len(vertices):
+            raise ValueError("triangles reference missing vertices")
+
+        if normals is None:
+            normals = compute_normals(vertices, triangles)
+        else:
+            normals = np.ascontiguousarray(normals, dtype=np.float32)
+            if normals.shape != vertices.shape:
+                raise ValueError(f"normals need to have shape {vertices.shape}, not {normals.shape}")
+
+        self.shape = {
+            "vertices": vertices,
+            "triangles": triangles,
+            "normals": normals,
+            "edges": (np.empty((0, 2, 3), dtype=np.float32), []),
+        }
+
+        # vertex colors are multiplied with the material color
+        self.color = Color(color or ((255, 255, 255) if colors is not None else get_default("default_color")))
+        if colors is not None:
+            self.shape["colors"] = np.ascontiguousarray(_colors(colors, vertices.shape), dtype=np.float32)
+
+    def to_nav_dict(self):
+        return {
+            "type": "leaf",
+            "name": self.name,
+            "id": self.id,
+            "color": self.color.web_color,
+        }
+
+    def to_state(self):
+        return [self.state_faces, EMPTY]
+
+    def collect_shapes(
+        self,
+        loc,
+        quality,
+        deviation,
+        angular_tolerance,
+        edge_accuracy,
+        render_edges,
+        render_normals,
+        progress=None,
+        timeit=False,
+    ):
+        with Timer(timeit, self.name, "bounding box:", 2) as t:
+            bb = _array_bounding_box(self.shape["vertices"], loc)
+            t.info = str(bb)
+
+        if progress:
+            progress.update()
+
+        return {
+            "id": self.id,
+            "type": "shapes",
+            "name": self.name,
+            "shape": self.shape,
+            "color": self.color.web_color,
+            "bb": bb.to_dict(),
+        }
+
+
+class _Points(_CADObject):
+    """Point cloud given as array of shape (n, 3)
+
+    colors: optional per point colors (n, 3), floats in [0, 1] or integers in [0, 255]
+    sizes: optional per point sizes in pixel (n,), quantized to at most max_sizes distinct sizes
+    voxel_size: if given, only the first point of every voxel of this edge length is displayed
+    """
+
+    def __init__(
+        self, points, name="Points", color=None, size=6, colors=None, sizes=None, voxel_size=None, max_sizes=8
+    ):
+        super().__init__()
+        self.name = name
+        self.id = self.next_id()
+        self.color = Color(color or (255, 0, 255))
+        self.size = size
+
+        points = np.asarray(points)
+        if points.ndim != 2 or points.shape[1] != 3 or len(points) == 0:
+            raise ValueError(f"points need to be a non empty array of shape (n, 3), not {points.shape}")
+
+        index = None if voxel_size is None else voxel_decimate(points, voxel_size)
+        select = (lambda a: a) if index is None else (lambda a: a[index])
+
+        self.shape = {"positions": np.ascontiguousarray(select(points), dtype=np.float32)}
+
+        if colors is not None:
+            colors = _colors(colors, points.shape)
+            self.shape["colors"] = np.ascontiguousarray(select(colors), dtype=np.float32)
+
+        if sizes is not None:
+            sizes = np.asarray(sizes, dtype=np.float32)
+            if sizes.shape != (len(points),):
+                raise ValueError(f"sizes need to have shape {(len(points),)}, not {sizes.shape}")
+            sizes = select(sizes)
+            # every distinct size is rendered as separate points object
+            if len(np.unique(sizes)) > max_sizes:
+                levels = np.linspace(sizes.min(), sizes.max(), max_sizes)
+                sizes = levels[np.abs(sizes[:, None] - levels).argmin(axis=1)]
+            self.shape["sizes"] = np.ascontiguousarray(sizes, dtype=np.float32)
+
+    def to_nav_dict(self):
+        return {
+            "type": "leaf",
+            "name": self.name,
+            "id": self.id,
+            "color": self.color.web_color,
+        }
+
+    def to_state(self):
+        return [SELECTED, EMPTY]
+
+    def collect_shapes(
+        self,
+        loc,
+        quality,
+        deviation,
+        angular_tolerance,
+        edge_accuracy,
+        render_edges,
+        render_normals,
+        progress=None,
+        timeit=False,
+    ):
+        with Timer(timeit, self.name, "bounding box:", 2) as t:
+            bb = _array_bounding_box(self.shape["positions"], loc)
+            t.info = str(bb)
+
+        if progress:
+            progress.update()
+
+        return {
+            "id": self.id,
+            "type": "points",
+            "name": self.name,
+            "shape": self.shape,
+            "color": self.color.web_color,
+            "size": self.size,
+            "bb": bb.to_dict(),
+        }
+
+
 class _PartGroup(_CADObject):
     def __init__(self, objects, name="Group", loc=None):
         super().__init__()
@@ -403,6 +645,8 @@ def _combined_bb(shapes):
 
 
 def _show(part_group, **kwargs):
+    from jupyter_cadquery.cad_display import get_or_create_display, has_sidecar
+
     for k in kwargs:
         if get_default(k, "n/a") == "n/a":
             raise KeyError(f"Paramater {k} is not a valid argument for show()")
@@ -452,6 +696,12 @@ def _show(part_group, **kwargs):
         with Timer(timeit, "", "show shapes", 1):
             d.add_shapes(shapes=shapes, mapping=mapping, tree=tree, bb=_combined_bb(shapes), **add_shape_args)
 
+    if timeit:
+        stats = d.widget_stats()
+        print(
+            f"widgets: {stats['widgets']} in scene, {stats['live_widgets']} alive, buffers: {stats['buffer_bytes']} bytes"
+        )
+
     d.info.version_msg(__version__)
     d.info.ready_msg(d.cq_view.grid.step)
 
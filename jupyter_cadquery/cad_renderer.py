@@ -56,6 +56,45 @@ def material(color, transparent=False, opacity=1.0):
     return material
 
 
+def collect_widgets(obj, result=None):
+    """Collect all widgets of a rendered object tree: groups, objects, geometries, buffers and materials"""
+    if result is None:
+        result = []
+
+    result.append(obj)
+    if isinstance(obj, Group):
+        for child in obj.children:
+            collect_widgets(child, result)
+    else:
+        geometry = getattr(obj, "geometry", None)
+        if geometry is not None:
+            result.append(geometry)
+            if isinstance(geometry, BufferGeometry):
+                result += list(geometry.attributes.values())
+        material = getattr(obj, "material", None)
+        if material is not None:
+            result.append(material)
+
+    return result
+
+
+def buffer_size(widgets):
+    """Approximate number of bytes of all array buffers held by the given widgets"""
+    size = 0
+    for widget in widgets:
+        if isinstance(widget, BufferAttribute):
+            size += getattr(widget.array, "nbytes", 0)
+        elif isinstance(widget, LineSegmentsGeometry):
+            size += getattr(widget.positions, "nbytes", 0) + getattr(widget.colors, "nbytes", 0)
+    return size
+
+
+def close_widgets(obj):
+    """Close all widgets of a rendered object tree to free the comms in kernel and browser"""
+    for widget in collect_widgets(obj):
+        widget.close()
+
+
 class IndexedGroup(Group):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -114,6 +153,16 @@ class CadqueryRenderer(object):
 
         self.timeit = timeit
 
+    def _render_points(self, vertices, color, size, colors=None):
+        attributes = {"position": BufferAttribute(vertices, normalized=False)}
+        if colors is None:
+            mat = PointsMaterial(color=color, sizeAttenuation=False, size=size)
+        else:
+            attributes["color"] = BufferAttribute(colors, normalized=False)
+            mat = PointsMaterial(vertexColors="VertexColors", sizeAttenuation=False, size=size)
+        geom = BufferGeometry(attributes=attributes)
+        return IndexedPoints(geometry=geom, material=mat)
+
     def _render_shape(
         self,
         shape=None,
@@ -124,6 +173,8 @@ class CadqueryRenderer(object):
         vertex_color=None,
         edge_width=1,
         vertex_width=5,
+        vertex_colors=None,
+        vertex_sizes=None,
         transparent=False,
         opacity=1.0,
     ):
@@ -141,29 +192,35 @@ class CadqueryRenderer(object):
             # Compute the tesselation and build mesh
             with Timer(self.timeit, "", "build mesh:", 5):
                 edge_list, normals_list = shape["edges"]
-                shape_geometry = BufferGeometry(
-                    attributes={
-                        "position": BufferAttribute(shape["vertices"]),
-                        "index": BufferAttribute(shape["triangles"]),
-                        "normal": BufferAttribute(shape["normals"]),
-                    }
-                )
+                attributes = {
+                    "position": BufferAttribute(shape["vertices"]),
+                    "index": BufferAttribute(shape["triangles"]),
+                    "normal": BufferAttribute(shape["normals"]),
+                }
+                if shape.get("colors") is not None:
+                    attributes["color"] = BufferAttribute(shape["colors"])
+                shape_geometry = BufferGeometry(attributes=attributes)
 
                 if mesh_color is None:
                     mesh_color = self.default_mesh_color
                 shp_material = material(mesh_color, transparent=transparent, opacity=opacity)
+                if shape.get("colors") is not None:
+                    shp_material.vertexColors = "VertexColors"
                 shape_mesh = IndexedMesh(geometry=shape_geometry, material=shp_material)
 
         if vertices is not None:
             if vertex_color is None:
                 vertex_color = self.default_edge_color  # same as edge_color
 
-            vertices_list = vertices
-            attributes = {"position": BufferAttribute(vertices_list, normalized=False)}
-
-            mat = PointsMaterial(color=vertex_color, sizeAttenuation=False, size=vertex_width)
-            geom = BufferGeometry(attributes=attributes)
-            points = IndexedPoints(geometry=geom, material=mat)
+            if vertex_sizes is None:
+                points = self._render_points(vertices, vertex_color, vertex_width, vertex_colors)
+            else:
+                # PointsMaterial has one size only, so render one points object per distinct size
+                points = IndexedGroup()
+                for size in np.unique(vertex_sizes):
+                    selected = vertex_sizes == size
+                    colors = None if vertex_colors is None else vertex_colors[selected]
+                    points.add(self._render_points(vertices[selected], vertex_color, float(size), colors))
 
         if edges is not None:
             edge_list = edges
@@ -227,6 +284,14 @@ class CadqueryRenderer(object):
                         vertex_color=shape["color"],
                         vertex_width=6,
                     )
+                elif shape["type"] == "points":
+                    options = dict(
+                        vertices=shape["shape"]["positions"],
+                        vertex_color=shape["color"],
+                        vertex_width=shape["size"],
+                        vertex_colors=shape["shape"].get("colors"),
+                        vertex_sizes=shape["shape"].get("sizes"),
+                    )
                 else:
                     options = dict(
                         shape=shape["shape"],
@@ -261,6 +326,8 @@ class CadqueryRenderer(object):
                 if points is not None:
                     points.name = shape["name"]
                     points.ind = {"group": (*current, ind), "shape": shape["ind"]}
+                    for child in points.children:
+                        child.name, child.ind = points.name, points.ind
                     group.add(points)
                     self._mapping[shape["ind"]]["mesh"] = (*current, ind)
                     ind += 1
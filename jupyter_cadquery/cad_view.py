@@ -40,10 +40,9 @@ with warnings.catch_warnings():
         from pythreejs import OrbitControls
 
 
-from jupyter_cadquery_widgets.widgets import state_diff
 from .cad_helpers import Grid, Axes
 from .utils import rotate, Color, Timer
-from .cad_renderer import CadqueryRenderer, IndexedMesh
+from .cad_renderer import CadqueryRenderer, IndexedMesh, collect_widgets, buffer_size, close_widgets
 from .defaults import get_default
 
 
@@ -78,10 +77,15 @@ class CadqueryView(object):
         self.pick_last_mesh = None
         self.pick_last_mesh_color = None
         self.pick_mapping = {}
+        self.group_lookup = {}
 
         self.camera = None
         self.axes = None
         self.grid = None
+        self.amb_light = None
+        self.key_lights = None
+        self.picker = None
+        self.empty_group = None
         self.scene = None
         self.controller = None
         self.renderer = None
@@ -98,7 +102,7 @@ class CadqueryView(object):
 
     def get_transparent(self):
         # if one object is transparent, all are
-        return self.pickable_objects.children[0].material.transparent
+        return self.is_transparent()
 
     def _scale(self, vec):
         r = self.bb.max_dist_from_center() * self.camera_distance_factor
@@ -151,6 +155,14 @@ class CadqueryView(object):
         except:
             return None
 
+    def _build_group_lookup(self):
+        # resolve all mesh and edge group paths once, so that visibility changes do not need to walk the tree
+        self.group_lookup = {}
+        for mapping in self.pick_mapping.values():
+            for group_index in mapping.values():
+                if group_index is not None:
+                    self.group_lookup[group_index] = self._get_group(group_index)
+
     def set_axes_visibility(self, value):
         self.axes.set_visibility(value)
 
@@ -173,7 +185,8 @@ class CadqueryView(object):
                     if type(obj) is IndexedMesh:
                         obj.material.transparent = value
 
-        toggle(self.pickable_objects, value)
+        if self.pickable_objects is not None:
+            toggle(self.pickable_objects, value)
 
     def set_black_edges(self, value):
         def toggle(group, value):
@@ -185,23 +198,28 @@ class CadqueryView(object):
                         if obj.material.linewidth == 1:
                             obj.material.color = "#000" if value else self.edge_color
 
-        toggle(self.pickable_objects, value)
+        if self.pickable_objects is not None:
+            toggle(self.pickable_objects, value)
 
     def set_visibility(self, ind, i, state):
-        feature = self.features[i]
-        group_index = self.pick_mapping[ind][feature]
-        group = self._get_group(group_index)
-        if group is not None:
-            group.visible = state == 1
-
-    def change_visibility(self, paths):
-        def f(states):
-            diffs = state_diff(states.get("old"), states.get("new"))
-            for diff in diffs:
-                [[obj, val]] = diff.items()
-                self.set_visibility(paths[obj], val["icon"], val["new"])
+        self.set_visibilities([(ind, i, state)])
 
-        return f
+    def set_visibilities(self, changes):
+        """Apply a batch of (shape path, feature index, state) visibility changes
+
+        Groups are found via the lookup dict instead of walking the scene, changes are deduplicated per
+        group and groups that already have the requested visibility are not touched (no comm message)
+        """
+        updates = {}
+        for ind, i, state in changes:
+            group_index = self.pick_mapping[ind][self.features[i]]
+            group = self.group_lookup.get(group_index)
+            if group is not None:
+                updates[group_index] = (group, state == 1)
+
+        for group, visible in updates.values():
+            if group.visible != visible:
+                group.visible = visible
 
     def set_clipping(self, tab):
         if tab == 0:
@@ -272,6 +290,8 @@ class CadqueryView(object):
         return self.camera.mode == "orthographic"
 
     def is_transparent(self):
+        if self.pickable_objects is None or not self.pickable_objects.children:
+            return False
         return self.pickable_objects.children[0].material.transparent
 
     def create(self):
@@ -348,6 +368,7 @@ class CadqueryView(object):
         # Render Shapes
         with Timer(self.timeit, "", "overall render", 3):
             self.pickable_objects, self.pick_mapping = self.cq_renderer.render(shapes, progress)
+            self._build_group_lookup()
 
         with Timer(self.timeit, "", "configure view", 3):
             bb_max = self.bb.max_dist_from_center()
@@ -383,14 +404,25 @@ class CadqueryView(object):
                 if self.initial_zoom is None:
                     self.initial_zoom = self.zoom
 
-            # Set up Helpers relative to bounding box
+            # Set up Helpers relative to bounding box, they are created once and then re-parameterized
             xy_max = max(abs(self.bb.xmin), abs(self.bb.xmax), abs(self.bb.ymin), abs(self.bb.ymax)) * 1.2
-            self.grid = Grid(
-                bb_center=self.bb.center, maximum=xy_max, colorCenterLine="#aaa", colorGrid="#ddd", ticks=ticks
-            )
+            if self.grid is None:
+                self.grid = Grid(
+                    bb_center=self.bb.center, maximum=xy_max, colorCenterLine="#aaa", colorGrid="#ddd", ticks=ticks
+                )
+                self.axes = Axes(bb_center=self.bb.center, length=self.grid.size / 2)
+                self.scene.add(self.axes.axes)
+                self.scene.add(self.grid.grid)
+            else:
+                grid_helper = self.grid.grid
+                self.grid.update(self.bb.center, xy_max, ticks)
+                if self.grid.grid is not grid_helper:
+                    self.scene.remove(grid_helper)
+                    # the replaced helper is not used any more, free its comms
+                    close_widgets(grid_helper)
+                    self.scene.add(self.grid.grid)
+                self.axes.update(self.bb.center, length=self.grid.size / 2)
             self.grid.set_visibility(False)
-
-            self.axes = Axes(bb_center=self.bb.center, length=self.grid.grid.size / 2)
             self.axes.set_visibility(False)
 
             # Set up the controller relative to bounding box
@@ -401,16 +433,29 @@ class CadqueryView(object):
             # Set up lights in every of the 8 corners of the global bounding box
             positions = list(itertools.product(*[(-orbit_radius, orbit_radius)] * 3))
 
-            self.amb_light = AmbientLight(intensity=ambient_intensity)
-            self.key_lights = [
-                DirectionalLight(color="white", position=position, intensity=direct_intensity)
-                for position in positions
-            ]
+            if self.amb_light is None:
+                self.amb_light = AmbientLight(intensity=ambient_intensity)
+                self.key_lights = [
+                    DirectionalLight(color="white", position=position, intensity=direct_intensity)
+                    for position in positions
+                ]
+                self.scene.add(self.amb_light)
+                self.scene.add(self.key_lights)
+            else:
+                self.amb_light.intensity = ambient_intensity
+                for light, position in zip(self.key_lights, positions):
+                    with light.hold_sync():
+                        light.position = position
+                        light.intensity = direct_intensity
 
             # Set up Picker
-            self.picker = Picker(controlling=self.pickable_objects, event="dblclick")
-            self.picker.observe(self.pick)
-            self.renderer.controls = self.renderer.controls + [self.picker]
+            if self.picker is None:
+                self.picker = Picker(controlling=self.pickable_objects, event="dblclick")
+                self.picker.observe(self.pick)
+            else:
+                self.picker.controlling = self.pickable_objects
+            # keep exactly the orbit controller and the picker, stale controls get dropped
+            self.renderer.controls = [self.controller, self.picker]
 
             # Set up camera
             self.update_camera(self.position, self.zoom, orbit_radius)
@@ -443,10 +488,7 @@ class CadqueryView(object):
         self._update()
 
     def add_to_scene(self):
-        self.scene.add(self.amb_light)
-        self.scene.add(self.key_lights)
-        self.scene.add(self.axes.axes)
-        self.scene.add(self.grid.grid)
+        # lights, axes and grid stay in the scene across calls, only the objects get replaced
         self.scene.add(self.pickable_objects)
 
     def clear(self):
@@ -454,12 +496,34 @@ class CadqueryView(object):
         self.zoom = self.camera.zoom
         self.position = self.camera.position
 
-        self.scene.remove(self.amb_light)
-        self.scene.remove(self.key_lights)
-        self.scene.remove(self.axes.axes)
-        self.scene.remove(self.grid.grid)
+        self.pick_last_mesh = None
+        self.pick_last_mesh_color = None
+
         self.scene.remove(self.pickable_objects)
 
+        # dispose all widgets of the previous objects, otherwise their comms stay alive
+        close_widgets(self.pickable_objects)
+        self.pickable_objects = None
+        self.pick_mapping = {}
+        self.group_lookup = {}
+
+        # the picker must not keep controlling the closed widgets
+        if self.picker is not None:
+            self.picker.controlling = self._empty_group()
+
+    def _empty_group(self):
+        # placeholder for the picker while no objects are shown (controlling must not be None)
+        if self.empty_group is None:
+            self.empty_group = Group()
+        return self.empty_group
+
+    def widget_stats(self):
+        if self.pickable_objects is None:
+            return {"widgets": 0, "buffer_bytes": 0}
+
+        widgets = collect_widgets(self.pickable_objects)
+        return {"widgets": len(widgets), "buffer_bytes": buffer_size(widgets)}
+
     @property
     def root_group(self):
         return self.pickable_objects
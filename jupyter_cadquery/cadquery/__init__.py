@@ -21,6 +21,8 @@ from .cad_objects import (
     Faces,
     Edges,
     Vertices,
+    Points,
+    Mesh,
     show,
     auto_show,
     show_accuracy,
@@ -28,11 +30,15 @@ from .cad_objects import (
 )
 from .replay import replay, enable_replay, disable_replay, reset_replay
 
+import sys
+
 try:
-    from IPython import get_ipython
+    # Only a running IPython kernel can be a notebook, so do not import IPython if nobody else did
+    if "IPython" in sys.modules:
+        from IPython import get_ipython
 
-    shell_name = get_ipython().__class__.__name__
-    if shell_name == "ZMQInteractiveShell":
-        auto_show()
+        shell_name = get_ipython().__class__.__name__
+        if shell_name == "ZMQInteractiveShell":
+            auto_show()
 except:
     ...
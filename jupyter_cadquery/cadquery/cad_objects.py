@@ -37,10 +37,11 @@ from jupyter_cadquery.cad_objects import (
     _Edges,
     _Faces,
     _Vertices,
+    _Points,
+    _Mesh,
     _show,
 )
 
-from jupyter_cadquery.cad_display import get_default
 from .cqparts import is_cqparts, convert_cqparts
 from ..utils import Color
 from ..ocp_utils import get_rgb
@@ -93,6 +94,22 @@ class Vertices(_Vertices):
         return show(self, grid=grid, axes=axes)
 
 
+class Points(_Points):
+    def to_assembly(self):
+        return PartGroup([self])
+
+    def show(self, grid=False, axes=False):
+        return show(self, grid=grid, axes=axes)
+
+
+class Mesh(_Mesh):
+    def to_assembly(self):
+        return PartGroup([self])
+
+    def show(self, grid=False, axes=False):
+        return show(self, grid=grid, axes=axes)
+
+
 class PartGroup(_PartGroup):
     def to_assembly(self):
         return self
@@ -310,14 +327,16 @@ def _is_wirelist(cad_obj):
     )
 
 
-def to_assembly(*cad_objs, render_mates=None, mate_scale=1, default_color=None):
+def to_assembly(*cad_objs, render_mates=None, mate_scale=1, default_color=None, obj_id=0):
     default_color = get_default("default_color") if default_color is None else default_color
     assembly = PartGroup([], "Group")
-    obj_id = 0
     for cad_obj in cad_objs:
-        if isinstance(cad_obj, (PartGroup, Part, Faces, Edges, Vertices)):
+        if isinstance(cad_obj, (PartGroup, Part, Faces, Edges, Vertices, Points, Mesh)):
             assembly.add(cad_obj)
 
+        elif isinstance(cad_obj, np.ndarray):
+            assembly.add(Points(cad_obj, "Points_%d" % obj_id))
+
         elif HAS_MASSEMBLY and isinstance(cad_obj, MAssembly):
             assembly.add(
                 from_assembly(
@@ -441,6 +460,8 @@ def auto_show():
     Faces._ipython_display_ = lambda self: self.show(grid=False, axes=False)
     Edges._ipython_display_ = lambda self: self.show(grid=False, axes=False)
     Vertices._ipython_display_ = lambda self: self.show(grid=False, axes=False)
+    Points._ipython_display_ = lambda self: self.show(grid=False, axes=False)
+    Mesh._ipython_display_ = lambda self: self.show(grid=False, axes=False)
 
     print("Overwriting auto display for cadquery Workplane and Shape")
 
@@ -14,24 +14,30 @@
 # limitations under the License.
 #
 
-try:
-    import cqparts
-    from cqparts.display.material import COLOR
-    from cqparts.utils.geometry import CoordSystem
-
-    has_cqparts = True
-except:
-    has_cqparts = False
+import sys
 
 import jupyter_cadquery as jcq
 
 
+def _has_cqparts():
+    # A cqparts object can only exist if cqparts has already been imported, so never import it for the check
+    return "cqparts" in sys.modules
+
+
 def is_cqparts_assembly(cad_obj):
-    return has_cqparts and has_cqparts and isinstance(cad_obj, cqparts.Assembly)
+    if not _has_cqparts():
+        return False
+    import cqparts
+
+    return isinstance(cad_obj, cqparts.Assembly)
 
 
 def is_cqparts_part(cad_obj):
-    return has_cqparts and has_cqparts and isinstance(cad_obj, cqparts.Part)
+    if not _has_cqparts():
+        return False
+    import cqparts
+
+    return isinstance(cad_obj, cqparts.Part)
 
 
 def is_cqparts(cad_obj):
@@ -39,11 +45,16 @@ def is_cqparts(cad_obj):
 
 
 def convert_cqparts(cad_obj, name="root", default_color=None, replay=False):
+    from cqparts.utils.geometry import CoordSystem
+
     cad_obj.world_coords = CoordSystem()
     return _convert_cqparts(cad_obj, name, default_color, replay)
 
 
 def _convert_cqparts(cad_obj, name, default_color, replay):
+    import cqparts
+    from cqparts.display.material import COLOR
+
     if default_color is None:
         default_color = (255, 255, 0)
 
@@ -74,6 +85,8 @@ def _convert_cqparts(cad_obj, name, default_color, replay):
 
 
 def get_parts(cad_obj, name="root"):
+    import cqparts
+
     parts = {}
     if isinstance(cad_obj, cqparts.Assembly):
         for k, v in cad_obj._components.items():
@@ -14,27 +14,27 @@
 # limitations under the License.
 #
 
-from dataclasses import dataclass, field
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from contextlib import contextmanager
 from typing import Any, List, Dict
+import functools
+import inspect
+import threading
+import types
 import warnings
 
-from IPython.display import display
-from IPython import get_ipython
-
-from ipywidgets import HBox, Output, SelectMultiple, Layout
-
 import cadquery as cq
 from jupyter_cadquery.cadquery import Part, show
 from jupyter_cadquery.cadquery.cqparts import is_cqparts_part, convert_cqparts
-from jupyter_cadquery.cad_display import get_or_create_display
-from .cad_objects import to_assembly
+from .cad_objects import to_assembly, PartGroup
 from jupyter_cadquery.cad_objects import _combined_bb
 from jupyter_cadquery.defaults import get_default
 
 #
 # The Runtime part
-# It hooks into __getattribute__ and intercept EVERY python call
-# One should only enable replay when necessary for debugging
+# Public Workplane methods are wrapped once per class, attribute access itself stays untouched.
+# Only the methods taking other workplanes (union, cut, intersect) hook into the lookup, see _LevelUp
 #
 
 
@@ -131,6 +131,22 @@ class Context(object):
 _CTX = Context()
 DEBUG = True
 REPLAY = False
+# number of steps whose parts and meshes a replay keeps (least recently used steps are dropped)
+CACHE_SIZE = 64
+
+# Tracing is per thread: workplane methods called e.g. by the replay prefetch must not touch _CTX
+_LOCAL = threading.local()
+
+
+@contextmanager
+def suspend_tracing():
+    """Call workplane methods in this thread without recording them in the replay context"""
+    suspended = getattr(_LOCAL, "suspended", False)
+    _LOCAL.suspended = True
+    try:
+        yield
+    finally:
+        _LOCAL.suspended = suspended
 
 
 def _trace(*objs):
@@ -138,72 +154,141 @@ def _trace(*objs):
         print(*objs)
 
 
-def _add_context(self, name):
-    def _blacklist(name):
-        return name.startswith("_") or name in (
-            "Workplane",
-            "val",
-            "vals",
-            "all",
-            "size",
-            "add",
-            "toOCC",
-            "findSolid",
-            "findFace",
-            "toSvg",
-            "exportSvg",
-            "largestDimension",
-        )
-
-    def _is_recursive(func):
-        return func in ["union", "cut", "intersect"]
-
-    def intercept(parent, func):
-        def f(*args, **kwargs):
-            _trace("1  calling", func.__name__, args, kwargs)
-            _trace(_CTX)
+BLACKLIST = (
+    "Workplane",
+    "val",
+    "vals",
+    "all",
+    "size",
+    "add",
+    "toOCC",
+    "findSolid",
+    "findFace",
+    "toSvg",
+    "exportSvg",
+    "largestDimension",
+)
 
-            if _is_recursive(func.__name__):
-                _ = _CTX.pop()
-                _trace("  --> level down")
-                _trace(_CTX)
+RECURSIVE = ("union", "cut", "intersect")
 
-            if _CTX.args is None:
-                _trace("2  updating")
-                _CTX.update(func.__name__, args, kwargs)
-                _trace(_CTX)
+# class -> {name: original function} of the currently wrapped classes
+_WRAPPED = {}
+# original function -> wrapper, reused when replay gets enabled again
+_WRAPPERS = {}
 
-            result = func(*args, **kwargs)
 
-            if func.__name__ == _CTX.func:
-                _CTX.obj = result
+def _is_traced(name):
+    return not (name.startswith("_") or name in BLACKLIST)
 
-                if _CTX.is_top_level():
-                    result._caller = _CTX.pop()
-                    _trace("<== _caller", func.__name__, result._caller)
-                else:
-                    context = _CTX.pop()
-                    _CTX.append_child(context)
-                    _trace("<== added child", context)
-                _CTX.new()
 
-            _trace("3  leaving", func.__name__)
+def _call(name, func, obj, args, kwargs):
+    # _trace calls are guarded, this runs for every traced method call
+    if getattr(_LOCAL, "suspended", False):
+        return func(obj, *args, **kwargs)
+
+    if DEBUG:
+        _trace("1  calling", name, args, kwargs)
+        _trace(_CTX)
+
+    if name in RECURSIVE:
+        _ = _CTX.pop()
+        if DEBUG:
+            _trace("  --> level down")
             _trace(_CTX)
-            return result
 
-        return f
+    if _CTX.args is None:
+        if DEBUG:
+            _trace("2  updating")
+        _CTX.update(name, args, kwargs)
+        if DEBUG:
+            _trace(_CTX)
+
+    result = func(obj, *args, **kwargs)
+
+    if name == _CTX.func:
+        _CTX.obj = result
 
-    attr = object.__getattribute__(self, name)
-    if callable(attr):
-        if not _blacklist(attr.__name__):
-            _trace("==> intercepting", attr.__name__)
-            if _is_recursive(attr.__name__):
+        if _CTX.is_top_level():
+            result._caller = _CTX.pop()
+            if DEBUG:
+                _trace("<== _caller", name, result._caller)
+        else:
+            context = _CTX.pop()
+            _CTX.append_child(context)
+            if DEBUG:
+                _trace("<== added child", context)
+        _CTX.new()
+
+    if DEBUG:
+        _trace("3  leaving", name)
+        _trace(_CTX)
+    return result
+
+
+def _traced(name, func):
+    @functools.wraps(func)
+    def traced(self, *args, **kwargs):
+        return _call(name, func, self, args, kwargs)
+
+    return traced
+
+
+class _LevelUp(object):
+    """Method descriptor that opens a new context level when the method is looked up
+
+    The lookup of e.g. a.union happens before its arguments get evaluated, so that workplanes
+    created in the arguments become children of the union call.
+    """
+
+    def __init__(self, name, func):
+        self.name = name
+        self.traced = _traced(name, func)
+        functools.update_wrapper(self, func)
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self.traced
+
+        if not getattr(_LOCAL, "suspended", False):
+            _CTX.new()
+            if DEBUG:
+                _trace("==> intercepting", self.name)
                 _trace("  --> level up")
-                _CTX.new()
-            _trace(_CTX)
+                _trace(_CTX)
+        return types.MethodType(self.traced, obj)
+
 
-            return intercept(self, attr)
-    return attr
+def _wrapper(name, func):
+    wrapper = _WRAPPERS.get(func)
+    if wrapper is None:
+        wrapper = _WRAPPERS[func] = _LevelUp(name, func) if name in RECURSIVE else _traced(name, func)
+    return wrapper
+
+
+def _classes(cls):
+    yield cls
+    for subclass in cls.__subclasses__():
+        yield from _classes(subclass)
+
+
+def wrap_workplane():
+    """Wrap the public methods of cq.Workplane and its subclasses"""
+    for cls in _classes(cq.Workplane):
+        if cls in _WRAPPED:
+            continue
+        originals = {
+            name: attr for name, attr in vars(cls).items() if _is_traced(name) and inspect.isfunction(attr)
+        }
+        for name, func in originals.items():
+            setattr(cls, name, _wrapper(name, func))
+        _WRAPPED[cls] = originals
+
+
+def unwrap_workplane():
+    for cls, originals in _WRAPPED.items():
+        for name, func in originals.items():
+            setattr(cls, name, func)
+    _WRAPPED.clear()
 
 
 #
@@ -227,7 +312,14 @@ class Step:
 
 
 class Replay(object):
+    # Meshing changes the OCC shapes in place, so select and prefetch must not tessellate concurrently.
+    # Shared by all instances, the prefetch of a replaced replay may still mesh the same shapes
+    lock = threading.Lock()
+
     def __init__(self, quality, deviation, angular_tolerance, edge_accuracy, debug, cad_width, height):
+        from ipywidgets import Output
+        from jupyter_cadquery.cad_display import get_or_create_display
+
         self.debug_output = Output()
         self.quality = quality
         self.deviation = deviation
@@ -238,6 +330,10 @@ class Replay(object):
         self.height = height
         self.display = get_or_create_display()
         self.reset_camera = True
+        # step index (or "result") -> parts and tessellated shapes, shared by select and the background prefetch
+        self.cache = OrderedDict()
+        self.prefetch_thread = None
+        self.stop_prefetch = threading.Event()
 
     def format_steps(self, raw_steps):
         def to_code(step, results):
@@ -298,78 +394,166 @@ class Replay(object):
         for step in reversed(steps):
             if step.level < last_level:
                 last_level = 1000000
-                entries.insert(0, (to_code(step, results), step.result_obj))
+                entries.append((to_code(step, results), step.result_obj))
                 if step.var != "":
                     last_level = step.level
 
+        entries.reverse()
         return entries
 
     def to_array(self, workplane, level=0, result_name=""):
-        def walk(caller, level=0, result_name=""):
-            stack = [
-                Step(
-                    level,
-                    func=caller["func"],
-                    args=caller["args"],
-                    kwargs=caller["kwargs"],
-                    result_name=result_name,
-                    result_obj=caller["obj"],
+        """Steps of the call tree of workplane in execution order
+
+        The tree is walked iteratively from the result backwards, so steps are collected in reverse order.
+        Workplanes that were already expanded at the same level are copied instead of walked again.
+        """
+        steps = []
+        expanded = {}  # (id(workplane), level) -> slice of steps
+        tasks = [("workplane", workplane, level)]
+
+        while tasks:
+            task = tasks.pop()
+            kind = task[0]
+
+            if kind == "workplane":
+                _, obj, level = task
+                key = (id(obj), level)
+                if key in expanded:
+                    steps.extend(replace(step) for step in steps[expanded[key]])
+                else:
+                    tasks.append(("expanded", key, len(steps)))
+                    tasks.append(("parents", obj, level))
+
+            elif kind == "parents":
+                _, obj, level = task
+                if obj is None:
+                    continue
+                tasks.append(("parents", obj.parent, level))
+                caller = getattr(obj, "_caller", None)
+                if caller is not None:
+                    tasks.extend(self._workplane_args(caller, level + 1))
+                    tasks.append(("caller", caller, level, getattr(obj, "name", "")))
+
+            elif kind == "caller":
+                _, caller, level, result_name = task
+                steps.append(
+                    Step(
+                        level,
+                        func=caller["func"],
+                        args=caller["args"],
+                        kwargs=caller["kwargs"],
+                        result_name=result_name,
+                        result_obj=caller["obj"],
+                    )
                 )
-            ]
-            for child in reversed(caller["children"]):
-                stack = walk(child, level + 1) + stack
-                for arg in child["args"]:
-                    if isinstance(arg, cq.Workplane):
-                        result_name = getattr(arg, "name", None)
-                        stack = self.to_array(arg, level=level + 2, result_name=result_name) + stack
-            return stack
-
-        stack = []
-
-        obj = workplane
-        while obj is not None:
-            caller = getattr(obj, "_caller", None)
-            result_name = getattr(obj, "name", "")
-            if caller is not None:
-                stack = walk(caller, level, result_name) + stack
-                for arg in caller["args"]:
-                    if isinstance(arg, cq.Workplane):
-                        result_name = getattr(arg, "name", "")
-                        stack = self.to_array(arg, level=level + 1, result_name=result_name) + stack
-            obj = obj.parent
-
-        return stack
+                for child in caller["children"]:
+                    tasks.extend(self._workplane_args(child, level + 2))
+                    tasks.append(("caller", child, level + 1, ""))
+
+            else:  # "expanded"
+                _, key, start = task
+                expanded[key] = slice(start, len(steps))
+
+        steps.reverse()
+        return steps
+
+    @staticmethod
+    def _workplane_args(caller, level):
+        # reversed, since tasks are taken from the end
+        return [("workplane", arg, level) for arg in reversed(caller["args"]) if isinstance(arg, cq.Workplane)]
 
     def select_handler(self, change):
         with self.debug_output:
             if change["name"] == "index":
                 self.select(change["new"])
 
+    def _step(self, key):
+        """Parts and tessellated shapes of a step (or of the hidden result), built once and kept in the cache
+
+        Faces, edges or vertices steps create new objects on every conversion, so the parts are cached, not only
+        their meshes. Callers hold the lock and have tracing suspended.
+        """
+        entry = self.cache.get(key)
+        if entry is not None:
+            self.cache.move_to_end(key)
+            return entry
+
+        if key == "result":
+            parts = [Part(self.stack[-1][1], "Result", show_faces=False, show_edges=False)]
+        else:
+            parts = to_assembly(self.stack[key][1], obj_id=key).objects
+        shapes = [
+            part.collect_shapes(
+                None,
+                self.quality,
+                self.deviation,
+                self.angular_tolerance,
+                self.edge_accuracy,
+                get_default("render_edges"),
+                get_default("render_normals"),
+            )
+            for part in parts
+        ]
+        entry = self.cache[key] = (parts, shapes)
+        if len(self.cache) > CACHE_SIZE:
+            self.cache.popitem(last=False)
+        return entry
+
+    def tessellate(self, keys):
+        """Assembly, mapping and shapes of the steps keys, see _step"""
+
+        def with_paths(shapes, mapping):
+            # the cached shapes are shared by all selections, so the paths are set on copies
+            if shapes.get("parts") is None:
+                return {**shapes, "ind": mapping[str(shapes["id"])]["path"]}
+            return {**shapes, "parts": [with_paths(obj, mapping) for obj in shapes["parts"]]}
+
+        assembly = PartGroup([], "Group")
+        step_shapes = []
+        # tessellation calls workplane methods (e.g. combine), they are not part of the user's model
+        with self.lock, suspend_tracing():
+            for key in keys:
+                parts, shapes = self._step(key)
+                assembly.add_list(parts)
+                step_shapes += shapes
+
+        mapping = assembly.to_state()
+        shapes = {"parts": [with_paths(obj, mapping) for obj in step_shapes], "loc": None, "name": assembly.name}
+        return assembly, mapping, shapes
+
+    def prefetch(self):
+        """Tessellate the steps from the last one backwards in a background thread until the cache is full
+
+        Later selections of these steps then only build widgets
+        """
+
+        def run():
+            for i in reversed(range(len(self.stack))):
+                if self.stop_prefetch.is_set() or len(self.cache) >= CACHE_SIZE:
+                    break
+                try:
+                    with self.lock, suspend_tracing():
+                        self._step(i)
+                except Exception as ex:
+                    if self.debug:
+                        print(f"prefetch of step {i} failed: {ex}")
+
+        self.prefetch_thread = threading.Thread(target=run, daemon=True)
+        self.prefetch_thread.start()
+
     def select(self, indexes):
         self.debug_output.clear_output()
         with self.debug_output:
             self.indexes = indexes
-            cad_objs = [self.stack[i][1] for i in self.indexes]
 
         # Add hidden result to start with final size and allow for comparison
         if not isinstance(self.stack[-1][1].val(), cq.Vector):
-            result = Part(self.stack[-1][1], "Result", show_faces=False, show_edges=False)
-            objs = [result] + cad_objs
+            keys = ["result"] + list(self.indexes)
         else:
-            objs = cad_objs
+            keys = list(self.indexes)
 
         with self.debug_output:
-            assembly = to_assembly(*objs)
-            mapping = assembly.to_state()
-            shapes = assembly.collect_mapped_shapes(
-                mapping,
-                quality=self.quality,
-                deviation=self.deviation,
-                angular_tolerance=self.angular_tolerance,
-                edge_accuracy=self.edge_accuracy,
-                render_edges=get_default("render_edges"),
-                render_normals=get_default("render_normals"),
-            )
+            assembly, mapping, shapes = self.tessellate(keys)
             tree = assembly.to_nav_dict()
 
             self.display.add_shapes(
@@ -378,6 +562,18 @@ class Replay(object):
             self.reset_camera = False
 
 
+# the last replay, its prefetch is stopped when it gets replaced
+_REPLAY = None
+
+
+def _stop_prefetch():
+    global _REPLAY
+
+    if _REPLAY is not None:
+        _REPLAY.stop_prefetch.set()
+        _REPLAY = None
+
+
 def replay(
     cad_obj,
     index=-1,
@@ -389,6 +585,8 @@ def replay(
     cad_width=600,
     height=600,
 ):
+    from IPython.display import display
+    from ipywidgets import HBox, SelectMultiple, Layout
 
     if not REPLAY:
         print("Replay is not enabled. To do so call 'enable_replay()'. Falling back to 'show()'")
@@ -396,7 +594,13 @@ def replay(
     else:
         print("Use the multi select box below to select one or more steps you want to examine")
 
+    global _REPLAY
+
+    # the previous replay is replaced, stop meshing its steps
+    _stop_prefetch()
+
     r = Replay(quality, deviation, angular_tolerance, edge_accuracy, debug, cad_width, height)
+    _REPLAY = r
 
     if isinstance(cad_obj, cq.Workplane):
         workplane = cad_obj
@@ -425,6 +629,7 @@ def replay(
     display(HBox([r.select_box, r.debug_output]))
 
     r.select(r.indexes)
+    r.prefetch()
     return r
 
 
@@ -450,10 +655,12 @@ def reset_replay():
 def enable_replay(warning=True, debug=False):
     global DEBUG, REPLAY
 
+    from IPython import get_ipython
+
     DEBUG = debug
 
     print("\nEnabling jupyter_cadquery replay")
-    cq.Workplane.__getattribute__ = _add_context
+    wrap_workplane()
 
     if warning:
         print("Note: To get rid of this warning, use 'enable_replay(False)'")
@@ -465,8 +672,11 @@ def enable_replay(warning=True, debug=False):
 
 def disable_replay():
     global REPLAY
+
+    from IPython import get_ipython
     print("Removing replay from cadquery.Workplane (will show a final RuntimeWarning if not suppressed)")
-    cq.Workplane.__getattribute__ = object.__getattribute__
+    unwrap_workplane()
+    _stop_prefetch()
 
     ip = get_ipython()
     if "reset_replay" in [f.__name__ for f in ip.events.callbacks["pre_run_cell"]]:
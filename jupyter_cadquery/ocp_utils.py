@@ -1,5 +1,3 @@
-import itertools
-import numpy as np
 
 from OCP.Bnd import Bnd_Box
 from OCP.BRep import BRep_Tool
@@ -20,38 +18,13 @@ from OCP.StlAPI import StlAPI_Writer
 
 from cadquery import Compound, Location
 from cadquery.occ_impl.shapes import downcast
-from .utils import distance
+from .utils import BoundingBox as BaseBoundingBox
 
 
 HASH_CODE_MAX = 2147483647
 
 
-class BoundingBox(object):
-    def __init__(self, obj=None, optimal=False, tol=1e-5):
-        self.optimal = optimal
-        self.tol = tol
-        if obj is None:
-            self.xmin = self.xmax = self.ymin = self.ymax = self.zmin = self.zmax = 0
-        elif isinstance(obj, BoundingBox):
-            self.xmin = obj.xmin
-            self.xmax = obj.xmax
-            self.ymin = obj.ymin
-            self.ymax = obj.ymax
-            self.zmin = obj.zmin
-            self.zmax = obj.zmax
-        elif isinstance(obj, dict):
-            self.xmin = obj["xmin"]
-            self.xmax = obj["xmax"]
-            self.ymin = obj["ymin"]
-            self.ymax = obj["ymax"]
-            self.zmin = obj["zmin"]
-            self.zmax = obj["zmax"]    
-        else:
-            bbox = self._bounding_box(obj, tol)
-            self.xmin, self.xmax, self.ymin, self.ymax, self.zmin, self.zmax = bbox
-        
-        self._calc()
-
+class BoundingBox(BaseBoundingBox):
     def _bounding_box(self, obj, tol=1e-5):
         bbox = Bnd_Box()
         if self.optimal:
@@ -62,82 +35,6 @@ class BoundingBox(object):
         values = bbox.Get()
         return (values[0], values[3], values[1], values[4], values[2], values[5])
 
-    def _calc(self):
-        self.xsize = self.xmax - self.xmin
-        self.ysize = self.ymax - self.ymin
-        self.zsize = self.zmax - self.zmin
-        self.center = (
-            self.xmin + self.xsize / 2.0,
-            self.ymin + self.ysize / 2.0,
-            self.zmin + self.zsize / 2.0,
-        )
-        self.max = max([abs(x) for x in (self.xmin, self.xmax, self.ymin, self.ymax, self.zmin, self.zmax)])
-
-    def is_empty(self, eps=0.01):
-        return (
-            (abs(self.xmax - self.xmin) < 0.01)
-            and (abs(self.ymax - self.ymin) < 0.01)
-            and (abs(self.zmax - self.zmin) < 0.01)
-        )
-
-    def max_dist_from_center(self):
-        return max(
-            [
-                distance(self.center, v)
-                for v in itertools.product((self.xmin, self.xmax), (self.ymin, self.ymax), (self.zmin, self.zmax))
-            ]
-        )
-
-    def max_dist_from_origin(self):
-        return max(
-            [
-                np.linalg.norm(v)
-                for v in itertools.product((self.xmin, self.xmax), (self.ymin, self.ymax), (self.zmin, self.zmax))
-            ]
-        )
-
-    def update(self, bb, minimize=False):
-        lower, upper = (max, min) if minimize else (min, max)
-
-        if isinstance(bb, BoundingBox):
-            self.xmin = lower(bb.xmin, self.xmin)
-            self.xmax = upper(bb.xmax, self.xmax)
-            self.ymin = lower(bb.ymin, self.ymin)
-            self.ymax = upper(bb.ymax, self.ymax)
-            self.zmin = lower(bb.zmin, self.zmin)
-            self.zmax = upper(bb.zmax, self.zmax)
-        elif isinstance(bb, dict):
-            self.xmin = lower(bb["xmin"], self.xmin)
-            self.xmax = upper(bb["xmax"], self.xmax)
-            self.ymin = lower(bb["ymin"], self.ymin)
-            self.ymax = upper(bb["ymax"], self.ymax)
-            self.zmin = lower(bb["zmin"], self.zmin)
-            self.zmax = upper(bb["zmax"], self.zmax)
-        else:
-            raise "Wrong bounding box param"
-
-        self._calc()
-
-    def to_dict(self):
-        return {
-            "xmin": self.xmin,
-            "xmax": self.xmax,
-            "ymin": self.ymin,
-            "ymax": self.ymax,
-            "zmin": self.zmin,
-            "zmax": self.zmax,
-        }
-
-    def __repr__(self):
-        return "{xmin:%.2f, xmax:%.2f, ymin:%.2f, ymax:%.2f, zmin:%.2f, zmax:%.2f}" % (
-            self.xmin,
-            self.xmax,
-            self.ymin,
-            self.ymax,
-            self.zmin,
-            self.zmax,
-        )
-
 
 def bounding_box(objs, loc=None, optimal=False):
     if isinstance(objs, (list, tuple)):
@@ -0,0 +1,103 @@
+#
+# Copyright 2021 Bernhard Walter
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import json
+import struct
+
+import numpy as np
+
+from .serialize import compress, decode, decompress, encode
+
+#
+# Scene bundles: tessellated scenes (tree, mapping with states, bounding boxes and meshes) on disk
+#
+# Layout:
+#   magic (8 bytes) | version (uint32) | header length (uint32) | JSON header | arrays
+# The JSON header holds the encoded scene and offset, size and codec of every array. Arrays start
+# at multiples of ALIGNMENT bytes, so uncompressed arrays can be used directly from a memory map.
+#
+
+SCENE_MAGIC = b"JCQSCENE"
+SCENE_VERSION = 1
+ALIGNMENT = 64
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def save_scene(filename, scene, codec=None):
+    """Save a scene as created by viewer.client._convert into a bundle file
+
+    codec: None (arrays stay memory-mappable) or a codec name, e.g. "zlib"
+    """
+    body, buffers = encode(scene)
+
+    blobs = []
+    arrays = []
+    offset = 0
+    for buffer in buffers:
+        blob, blob_codec = buffer, None
+        if codec is not None:
+            compressed = compress(codec, buffer)
+            if len(compressed) < buffer.nbytes:
+                blob, blob_codec = compressed, codec
+        size = memoryview(blob).nbytes
+        arrays.append({"offset": offset, "nbytes": size, "codec": blob_codec})
+        blobs.append(blob)
+        offset = _align(offset + size)
+
+    header = json.dumps({"version": SCENE_VERSION, "arrays": arrays, "body": body}).encode()
+    start = _align(len(SCENE_MAGIC) + 8 + len(header))
+
+    with open(filename, "wb") as fd:
+        fd.write(SCENE_MAGIC)
+        fd.write(struct.pack("<II", SCENE_VERSION, len(header)))
+        fd.write(header)
+        for array, blob in zip(arrays, blobs):
+            fd.write(b"\0" * (start + array["offset"] - fd.tell()))
+            fd.write(blob)
+
+
+def load_scene(filename, mmap=True):
+    """Load a scene bundle
+
+    With mmap, uncompressed arrays are read only views into a memory map of the file, so meshes are
+    only read from disk when they get rendered
+    """
+    with open(filename, "rb") as fd:
+        if fd.read(len(SCENE_MAGIC)) != SCENE_MAGIC:
+            raise ValueError(f"{filename} is not a scene bundle")
+        version, size = struct.unpack("<II", fd.read(8))
+        if version > SCENE_VERSION:
+            raise ValueError(f"Scene bundle version {version} is not supported (<= {SCENE_VERSION})")
+        header = json.loads(fd.read(size))
+
+    start = _align(len(SCENE_MAGIC) + 8 + size)
+    if mmap:
+        data = np.memmap(filename, dtype=np.uint8, mode="r")
+    else:
+        data = np.fromfile(filename, dtype=np.uint8)
+
+    buffers = []
+    for array in header["arrays"]:
+        offset = start + array["offset"]
+        blob = data[offset : offset + array["nbytes"]]
+        if array["codec"] is not None:
+            blob = decompress(array["codec"], blob)
+        buffers.append(blob)
+
+    return decode(header["body"], buffers)
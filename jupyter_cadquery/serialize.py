@@ -0,0 +1,269 @@
+#
+# Copyright 2021 Bernhard Walter
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import json
+import sys
+import time
+import zlib
+
+import numpy as np
+
+# arrays below this size are never compressed
+COMPRESSION_THRESHOLD = 64 * 1024
+
+#
+# Pickle free serialization of tessellated data
+# A nested structure of dicts, lists, tuples and numpy arrays is split into a JSON header
+# and a list of raw array buffers. Array nodes in the header only reference their buffer.
+#
+
+
+def _bounding_box_class():
+    # Bounding boxes can only exist if utils has already been imported
+    module = sys.modules.get("jupyter_cadquery.utils")
+    return None if module is None else module.BoundingBox
+
+
+def encode(obj):
+    buffers = []
+    bb_class = _bounding_box_class()
+
+    def enc(o):
+        if isinstance(o, np.ndarray):
+            buffers.append(np.ascontiguousarray(o))
+            return {"__ndarray__": len(buffers) - 1, "dtype": o.dtype.str, "shape": list(o.shape)}
+        elif isinstance(o, dict):
+            return {k: enc(v) for k, v in o.items()}
+        elif isinstance(o, tuple):
+            # tuples are used as dict keys (paths) after decoding, so they need to survive JSON
+            return {"__tuple__": [enc(v) for v in o]}
+        elif isinstance(o, list):
+            return [enc(v) for v in o]
+        elif isinstance(o, np.generic):
+            return o.item()
+        elif bb_class is not None and isinstance(o, bb_class):
+            return {"__bb__": o.to_dict()}
+        else:
+            return o
+
+    return enc(obj), buffers
+
+
+def decode(header, buffers):
+    def dec(o):
+        if isinstance(o, dict):
+            if "__ndarray__" in o:
+                array = np.frombuffer(buffers[o["__ndarray__"]], dtype=o["dtype"])
+                return array.reshape(o["shape"])
+            elif "__tuple__" in o:
+                return tuple(dec(v) for v in o["__tuple__"])
+            elif "__bb__" in o:
+                # the plain bounding box of utils, decoding must not depend on OCP
+                from .utils import BoundingBox
+
+                return BoundingBox(o["__bb__"])
+            else:
+                return {k: dec(v) for k, v in o.items()}
+        elif isinstance(o, list):
+            return [dec(v) for v in o]
+        else:
+            return o
+
+    return dec(header)
+
+
+def dumps(obj):
+    """Serialize obj into a JSON header (bytes) and a list of contiguous numpy arrays"""
+    header, buffers = encode(obj)
+    return json.dumps(header).encode(), buffers
+
+
+def loads(header, buffers):
+    """Rebuild an object from a JSON header (bytes or str) and its array buffers without copying them"""
+    return decode(json.loads(header), buffers)
+
+
+#
+# Frame compression: zlib is always available, lz4 and zstd if installed
+#
+
+
+def _codecs():
+    codecs = {}
+    try:
+        import zstandard
+
+        codecs["zstd"] = (zstandard.ZstdCompressor(level=3).compress, zstandard.ZstdDecompressor().decompress)
+    except ImportError:
+        pass
+
+    try:
+        import lz4.frame
+
+        codecs["lz4"] = (lz4.frame.compress, lz4.frame.decompress)
+    except ImportError:
+        pass
+
+    codecs["zlib"] = (lambda buffer: zlib.compress(buffer, 1), zlib.decompress)
+    return codecs
+
+
+CODECS = None
+
+
+def available_codecs():
+    """Names of the available codecs, in order of preference"""
+    global CODECS
+
+    if CODECS is None:
+        CODECS = _codecs()
+    return list(CODECS.keys())
+
+
+def compress(codec, buffer):
+    if codec not in available_codecs():
+        raise ValueError(f"Unsupported codec {codec}")
+    return CODECS[codec][0](buffer)
+
+
+def decompress(codec, buffer):
+    if codec not in available_codecs():
+        raise ValueError(f"Unsupported codec {codec}")
+    return CODECS[codec][1](buffer)
+
+
+def select_codec(codecs, preferred="auto"):
+    """Best codec available on both sides (None if there is none)"""
+    common = [codec for codec in available_codecs() if codec in codecs]
+    if preferred == "auto":
+        return common[0] if common else None
+    return preferred if preferred in common else None
+
+
+def to_frames(obj, codec=None, threshold=COMPRESSION_THRESHOLD, stats=None, share=None):
+    """Multipart message: JSON header frame followed by one raw frame per array (to be sent with copy=False)
+
+    With a codec, arrays of at least threshold bytes are compressed if this makes them smaller.
+    share(array) can move an array out of band (e.g. into shared memory) and returns its name or None,
+    the frame of a shared array is empty. If given, stats receives raw and sent bytes plus the compression time
+    """
+    if codec is not None and codec not in available_codecs():
+        raise ValueError(f"Unsupported codec {codec}")
+
+    header, buffers = encode(obj)
+
+    start = time.perf_counter()
+    codecs = []
+    shared = []
+    frames = []
+    raw_bytes = sent_bytes = shared_bytes = 0
+    for buffer in buffers:
+        raw_bytes += buffer.nbytes
+        name = None if share is None else share(buffer)
+        shared.append(None if name is None else [name, buffer.nbytes])
+        if name is not None:
+            shared_bytes += buffer.nbytes
+            codecs.append(None)
+            frames.append(b"")
+            continue
+
+        if codec is not None and buffer.nbytes >= threshold:
+            compressed = compress(codec, buffer)
+            if len(compressed) < buffer.nbytes:
+                codecs.append(codec)
+                frames.append(compressed)
+                sent_bytes += len(compressed)
+                continue
+        codecs.append(None)
+        frames.append(buffer)
+        sent_bytes += buffer.nbytes
+
+    if stats is not None:
+        stats.update(
+            codec=codec,
+            raw_bytes=raw_bytes,
+            sent_bytes=sent_bytes,
+            shared_bytes=shared_bytes,
+            compress_time=time.perf_counter() - start,
+        )
+
+    message = {"codecs": codecs, "body": header}
+    if share is not None:
+        message["shared"] = shared
+    return [json.dumps(message).encode()] + frames
+
+
+def from_frames(frames, stats=None, attach=None):
+    """Rebuild an object from multipart frames (bytes or buffers)
+
+    Uncompressed arrays are views into the frames. attach(name, nbytes) maps out of band arrays.
+    If given, stats receives sizes and decompression time
+    """
+    message = json.loads(bytes(frames[0]))
+    shared = message.get("shared") or [None] * len(message["codecs"])
+    if attach is None and any(ref is not None for ref in shared):
+        raise ValueError("Message references shared memory, but shared memory is not supported")
+
+    start = time.perf_counter()
+    buffers = []
+    raw_bytes = sent_bytes = shared_bytes = 0
+    for frame, codec, ref in zip(frames[1:], message["codecs"], shared):
+        if ref is not None:
+            name, nbytes = ref
+            frame = attach(name, nbytes)
+            raw_bytes += nbytes
+            shared_bytes += nbytes
+            buffers.append(frame)
+            continue
+
+        sent_bytes += memoryview(frame).nbytes
+        if codec is not None:
+            frame = decompress(codec, frame)
+        raw_bytes += memoryview(frame).nbytes
+        buffers.append(frame)
+
+    if stats is not None:
+        stats.update(
+            raw_bytes=raw_bytes,
+            sent_bytes=sent_bytes,
+            shared_bytes=shared_bytes,
+            decompress_time=time.perf_counter() - start,
+        )
+
+    return decode(message["body"], buffers)
+
+
+#
+# Compact array file format (numpy npz without pickle)
+#
+
+
+def save_npz(filename, obj, compressed=True):
+    header, buffers = dumps(obj)
+    arrays = {"header": np.frombuffer(header, dtype=np.uint8)}
+    for i, buffer in enumerate(buffers):
+        arrays[f"a{i}"] = buffer
+    if compressed:
+        np.savez_compressed(filename, **arrays)
+    else:
+        np.savez(filename, **arrays)
+
+
+def load_npz(filename):
+    with np.load(filename, allow_pickle=False) as npz:
+        header = npz["header"].tobytes()
+        buffers = [npz[f"a{i}"] for i in range(len(npz.files) - 1)]
+    return loads(header, buffers)
@@ -0,0 +1,144 @@
+#
+# Copyright 2021 Bernhard Walter
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import io
+import os
+import threading
+
+import numpy as np
+import zmq
+
+from jupyter_cadquery.serialize import from_frames, to_frames
+from jupyter_cadquery.tessellator import tessellate as local_tessellate
+from jupyter_cadquery.utils import warn
+
+# e.g. "tcp://localhost:5556", None means tessellate in process
+SERVICE = os.environ.get("JCQ_TESSELLATION_SERVICE")
+PING_TIMEOUT = 500
+REQUEST_TIMEOUT = 120000
+
+
+def set_service(address):
+    """Use the tessellation service at address (None to tessellate in process again)"""
+    global SERVICE
+    SERVICE = address
+    CLIENT.reset()
+
+
+class ServiceClient:
+    """REQ connection to the tessellation service, given up on until the next reset if it does not answer"""
+
+    def __init__(self):
+        self.context = None
+        self.socket = None
+        self.available = None
+        self.lock = threading.Lock()
+
+    def _reset(self):
+        if self.socket is not None:
+            self.socket.setsockopt(zmq.LINGER, 0)
+            self.socket.close()
+            self.socket = None
+
+    def reset(self):
+        with self.lock:
+            self._reset()
+            self.available = None
+
+    def _request(self, msg, timeout):
+        if self.socket is None:
+            if self.context is None:
+                self.context = zmq.Context()
+            self.socket = self.context.socket(zmq.REQ)
+            self.socket.connect(SERVICE)
+
+        self.socket.send_multipart(to_frames(msg), copy=False)
+        if (self.socket.poll(timeout) & zmq.POLLIN) == 0:
+            self._reset()
+            return None
+        return from_frames(self.socket.recv_multipart())
+
+    def request(self, msg, timeout=REQUEST_TIMEOUT):
+        """Reply of the service or None if it is not available"""
+        with self.lock:
+            if self.available is None:
+                reply = self._request({"type": "ping"}, PING_TIMEOUT)
+                self.available = reply is not None
+                if not self.available:
+                    warn(f"Tessellation service {SERVICE} not reachable, tessellating in process")
+
+            if not self.available:
+                return None
+
+            reply = self._request(msg, timeout)
+            if reply is None:
+                self.available = False
+                warn(f"Tessellation service {SERVICE} did not answer, tessellating in process")
+            return reply
+
+
+CLIENT = ServiceClient()
+
+
+def _brep(shapes):
+    from OCP.BRepBuilderAPI import BRepBuilderAPI_Copy
+    from OCP.BRepTools import BRepTools
+    from cadquery import Compound
+
+    compound = Compound._makeCompound(shapes) if len(shapes) > 1 else shapes[0]
+    # A copy without triangulation, so that the blob (and the cache key) only depends on the geometry.
+    # Cleaning the compound itself would drop the meshes of the caller's shapes, they share their TShapes
+    copy = BRepBuilderAPI_Copy(compound, True, False).Shape()
+    stream = io.BytesIO()
+    BRepTools.Write_s(copy, stream)
+    return np.frombuffer(stream.getvalue(), dtype=np.uint8)
+
+
+def tessellate(
+    shapes,
+    quality: float,
+    angular_tolerance: float,
+    tessellate=True,
+    compute_edges=True,
+    normals_len=0,
+    debug=False,
+):
+    """Same as tessellator.tessellate, but uses the tessellation service if configured and reachable"""
+    if SERVICE is None or not tessellate:
+        return local_tessellate(shapes, quality, angular_tolerance, tessellate, compute_edges, normals_len, debug)
+
+    reply = CLIENT.request(
+        {
+            "type": "tessellate",
+            "brep": _brep(shapes),
+            "quality": quality,
+            "angular_tolerance": angular_tolerance,
+            "compute_edges": compute_edges,
+            "normals_len": normals_len,
+        }
+    )
+    if reply is None or reply["result"] != "success":
+        if reply is not None:
+            warn(f"Tessellation service failed: {reply['msg']}")
+        return local_tessellate(shapes, quality, angular_tolerance, tessellate, compute_edges, normals_len, debug)
+
+    return reply["mesh"]
+
+
+def get_stats():
+    """Cache and request statistics of the tessellation service, None if not available"""
+    reply = CLIENT.request({"type": "stats"}, PING_TIMEOUT)
+    return None if reply is None else reply["stats"]
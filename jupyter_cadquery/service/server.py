@@ -0,0 +1,165 @@
+#
+# Copyright 2021 Bernhard Walter
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+#
+# Long lived tessellation service shared by many client processes
+#
+# Usage: python -m jupyter_cadquery.service.server [-a <address>] [-w <workers>]
+#
+# Requests carry a BREP blob plus tessellation parameters. Meshes are computed in a process pool
+# and kept in a content addressed cache, so re-running a script only tessellates changed shapes.
+#
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from time import localtime
+import argparse
+import io
+import os
+import queue
+import time
+
+import zmq
+
+from jupyter_cadquery.serialize import from_frames, to_frames
+from jupyter_cadquery.viewer.mesh_store import MeshStore, content_hash
+
+ADDRESS = "tcp://*:5556"
+
+
+def info(*msg):
+    ts = datetime(*localtime()[:6]).isoformat()
+    print(f"{ts} (I) ", *msg, flush=True)
+
+
+def cache_key(request):
+    params = [request[k] for k in ("quality", "angular_tolerance", "compute_edges", "normals_len")]
+    return content_hash((request["brep"], params))
+
+
+def _tessellate_brep(brep, quality, angular_tolerance, compute_edges, normals_len):
+    # runs in a worker process
+    from OCP.BRep import BRep_Builder
+    from OCP.BRepTools import BRepTools
+    from OCP.TopoDS import TopoDS_Shape
+    from jupyter_cadquery.tessellator import tessellate
+
+    shape = TopoDS_Shape()
+    BRepTools.Read_s(shape, io.BytesIO(brep.tobytes()), BRep_Builder())
+    return tessellate(
+        [shape], quality, angular_tolerance, compute_edges=compute_edges, normals_len=normals_len
+    )
+
+
+class TessellationServer(object):
+    def __init__(self, address=ADDRESS, workers=None, max_bytes=1024 ** 3):
+        self.address = address
+        self.workers = workers or os.cpu_count()
+        self.cache = MeshStore(max_bytes)
+        # cache key -> identities of the clients waiting for this mesh
+        self.pending = {}
+        self.finished = queue.Queue()
+        self.stats = {"requests": 0, "hits": 0, "misses": 0, "errors": 0}
+
+    def _reply(self, socket, identity, msg):
+        socket.send_multipart([identity, b""] + to_frames(msg), copy=False)
+
+    def _request(self, socket, pool, identity, request):
+        typ = request.get("type")
+        if typ == "ping":
+            self._reply(socket, identity, {"result": "success"})
+
+        elif typ == "stats":
+            stats = {**self.stats, "cached_meshes": len(self.cache), "cached_bytes": self.cache.size}
+            self._reply(socket, identity, {"result": "success", "stats": stats, "workers": self.workers})
+
+        elif typ == "tessellate":
+            self.stats["requests"] += 1
+            key = cache_key(request)
+            mesh = self.cache.get(key)
+            if mesh is not None:
+                self.stats["hits"] += 1
+                self._reply(socket, identity, {"result": "success", "mesh": mesh, "cached": True})
+
+            elif key in self.pending:
+                # the same shape is already being tessellated for another client
+                self.pending[key].append(identity)
+
+            else:
+                self.stats["misses"] += 1
+                self.pending[key] = [identity]
+                future = pool.submit(
+                    _tessellate_brep,
+                    request["brep"],
+                    request["quality"],
+                    request["angular_tolerance"],
+                    request["compute_edges"],
+                    request["normals_len"],
+                )
+                future.add_done_callback(lambda f, key=key, start=time.time(): self.finished.put((key, f, start)))
+
+        else:
+            self._reply(socket, identity, {"result": "error", "msg": f"Wrong message type {typ}"})
+
+    def _finish(self, socket, key, future, start):
+        identities = self.pending.pop(key)
+        try:
+            mesh = future.result()
+            self.cache.put(key, mesh)
+            msg = {"result": "success", "mesh": mesh, "cached": False}
+            info(f"tessellated {key[:8]} in {time.time() - start:.3f} s for {len(identities)} client(s)")
+        except Exception as ex:
+            self.stats["errors"] += 1
+            msg = {"result": "error", "msg": f"{type(ex).__name__}: {ex}"}
+            info(f"failed {key[:8]}: {msg['msg']}")
+
+        for identity in identities:
+            self._reply(socket, identity, msg)
+
+    def serve(self):
+        context = zmq.Context()
+        socket = context.socket(zmq.ROUTER)
+        socket.bind(self.address)
+        info(f"tessellation service listening on {self.address} with {self.workers} workers")
+
+        with ProcessPoolExecutor(self.workers) as pool:
+            while True:
+                # finished meshes are collected by polling, zmq sockets must stay in this thread
+                if (socket.poll(10 if self.pending else None) & zmq.POLLIN) != 0:
+                    frames = socket.recv_multipart(copy=False)
+                    identity = frames[0].bytes
+                    try:
+                        request = from_frames([frame.buffer for frame in frames[2:]])
+                    except Exception as ex:
+                        self._reply(socket, identity, {"result": "error", "msg": f"{type(ex).__name__}: {ex}"})
+                        continue
+                    self._request(socket, pool, identity, request)
+
+                while not self.finished.empty():
+                    self._finish(socket, *self.finished.get())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared tessellation service for jupyter_cadquery")
+    parser.add_argument("-a", "--address", default=ADDRESS, help=f"zmq address to bind (default {ADDRESS})")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="number of worker processes")
+    args = parser.parse_args()
+
+    TessellationServer(args.address, args.workers).serve()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,9 @@
+import itertools
 import math
 import numpy as np
 import time
 import warnings
 from webcolors import name_to_rgb, hex_to_rgb, rgb_to_hex
-import ipywidgets as widgets
 
 
 class Color:
@@ -65,6 +65,113 @@ def distance(v1, v2):
     return np.linalg.norm([x - y for x, y in zip(v1, v2)])
 
 
+class BoundingBox(object):
+    def __init__(self, obj=None, optimal=False, tol=1e-5):
+        self.optimal = optimal
+        self.tol = tol
+        if obj is None:
+            self.xmin = self.xmax = self.ymin = self.ymax = self.zmin = self.zmax = 0
+        elif isinstance(obj, BoundingBox):
+            self.xmin = obj.xmin
+            self.xmax = obj.xmax
+            self.ymin = obj.ymin
+            self.ymax = obj.ymax
+            self.zmin = obj.zmin
+            self.zmax = obj.zmax
+        elif isinstance(obj, dict):
+            self.xmin = obj["xmin"]
+            self.xmax = obj["xmax"]
+            self.ymin = obj["ymin"]
+            self.ymax = obj["ymax"]
+            self.zmin = obj["zmin"]
+            self.zmax = obj["zmax"]
+        else:
+            bbox = self._bounding_box(obj, tol)
+            self.xmin, self.xmax, self.ymin, self.ymax, self.zmin, self.zmax = bbox
+
+        self._calc()
+
+    def _bounding_box(self, obj, tol=1e-5):
+        # shapes are measured by ocp_utils.BoundingBox, this class only handles plain values
+        raise TypeError(f"Cannot calculate the bounding box of {type(obj).__name__}")
+
+    def _calc(self):
+        self.xsize = self.xmax - self.xmin
+        self.ysize = self.ymax - self.ymin
+        self.zsize = self.zmax - self.zmin
+        self.center = (
+            self.xmin + self.xsize / 2.0,
+            self.ymin + self.ysize / 2.0,
+            self.zmin + self.zsize / 2.0,
+        )
+        self.max = max([abs(x) for x in (self.xmin, self.xmax, self.ymin, self.ymax, self.zmin, self.zmax)])
+
+    def is_empty(self, eps=0.01):
+        return (
+            (abs(self.xmax - self.xmin) < 0.01)
+            and (abs(self.ymax - self.ymin) < 0.01)
+            and (abs(self.zmax - self.zmin) < 0.01)
+        )
+
+    def max_dist_from_center(self):
+        return max(
+            [
+                distance(self.center, v)
+                for v in itertools.product((self.xmin, self.xmax), (self.ymin, self.ymax), (self.zmin, self.zmax))
+            ]
+        )
+
+    def max_dist_from_origin(self):
+        return max(
+            [
+                np.linalg.norm(v)
+                for v in itertools.product((self.xmin, self.xmax), (self.ymin, self.ymax), (self.zmin, self.zmax))
+            ]
+        )
+
+    def update(self, bb, minimize=False):
+        lower, upper = (max, min) if minimize else (min, max)
+
+        if isinstance(bb, BoundingBox):
+            self.xmin = lower(bb.xmin, self.xmin)
+            self.xmax = upper(bb.xmax, self.xmax)
+            self.ymin = lower(bb.ymin, self.ymin)
+            self.ymax = upper(bb.ymax, self.ymax)
+            self.zmin = lower(bb.zmin, self.zmin)
+            self.zmax = upper(bb.zmax, self.zmax)
+        elif isinstance(bb, dict):
+            self.xmin = lower(bb["xmin"], self.xmin)
+            self.xmax = upper(bb["xmax"], self.xmax)
+            self.ymin = lower(bb["ymin"], self.ymin)
+            self.ymax = upper(bb["ymax"], self.ymax)
+            self.zmin = lower(bb["zmin"], self.zmin)
+            self.zmax = upper(bb["zmax"], self.zmax)
+        else:
+            raise "Wrong bounding box param"
+
+        self._calc()
+
+    def to_dict(self):
+        return {
+            "xmin": self.xmin,
+            "xmax": self.xmax,
+            "ymin": self.ymin,
+            "ymax": self.ymax,
+            "zmin": self.zmin,
+            "zmax": self.zmax,
+        }
+
+    def __repr__(self):
+        return "{xmin:%.2f, xmax:%.2f, ymin:%.2f, ymax:%.2f, zmin:%.2f, zmax:%.2f}" % (
+            self.xmin,
+            self.xmax,
+            self.ymin,
+            self.ymax,
+            self.zmin,
+            self.zmax,
+        )
+
+
 def rad(deg):
     return deg / 180.0 * math.pi
 
@@ -146,6 +253,17 @@ def tree_find_single_selector(tree, selector):
     return None
 
 
+def tree_index(tree):
+    """Name -> node of all nodes of the tree, the first node in depth first order wins for duplicate names"""
+    index = {}
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        index.setdefault(node.name, node)
+        stack.extend(reversed(getattr(node, "children", ())))
+    return index
+
+
 class Timer:
     def __init__(self, timeit, name, activity, level=0):
         if isinstance(timeit, bool):
@@ -175,6 +293,8 @@ class Timer:
 
 class Progress:
     def __init__(self, max_, width):
+        import ipywidgets as widgets
+
         self.max = max_
         self.progress = widgets.IntProgress(
             0,
@@ -19,60 +19,489 @@ from jupyter_cadquery.defaults import get_defaults
 from jupyter_cadquery.cad_objects import _combined_bb
 from jupyter_cadquery.defaults import get_default, get_defaults
 from jupyter_cadquery.cadquery import PartGroup, Part
-
-import pickle
+from jupyter_cadquery.scene import save_scene as _save_scene
+from jupyter_cadquery.serialize import COMPRESSION_THRESHOLD, select_codec, to_frames
+from jupyter_cadquery.viewer.mesh_store import add_hashes, leaves, with_refs
+from jupyter_cadquery.viewer import shm
+from jupyter_cadquery.utils import warn
+
+from concurrent.futures import Future, wait
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
 import zmq
 
 ZMQ_PORT = 5555
 REQUEST_TIMEOUT = 2000
 OBJECTS = []
+ASYNC = False
+COMPRESSION = None
+SHARED_MEMORY = False
+STREAM = False
+STREAM_WINDOW = 4
+# the reply to the last message of a stream is only sent after the viewer rendered the shapes
+RENDER_TIMEOUT = 300000
 
 
 def set_port(port):
     global ZMQ_PORT
     ZMQ_PORT = port
+    CONNECTION.reset()
 
 
-def connect(context):
-    endpoint = f"tcp://localhost:{ZMQ_PORT}"
-    socket = context.socket(zmq.REQ)
-    socket.connect(endpoint)
-    return socket
+def set_async(value):
+    """Let show() return immediately with a future instead of waiting for the viewer"""
+    global ASYNC
+    ASYNC = value
 
 
-def send(data):
-    context = zmq.Context()
-    socket = connect(context)
+def set_streaming(value, window=None):
+    """Send shapes as a stream: the tree first, then one mesh per message with at most window unacknowledged"""
+    global STREAM, STREAM_WINDOW
+    STREAM = value
+    if window is not None:
+        STREAM_WINDOW = window
 
-    msg = pickle.dumps(data, 4)
-    print(" sending ... ", end="")
-    socket.send(msg)
 
-    retries_left = 3
-    while True:
-        if (socket.poll(REQUEST_TIMEOUT) & zmq.POLLIN) != 0:
-            reply = socket.recv_json()
+def set_compression(codec="auto", threshold=None):
+    """Compress mesh frames sent to the viewer
+
+    codec is "auto" (best codec both sides support), a codec name ("zstd", "lz4", "zlib") or None to switch off.
+    Arrays smaller than threshold bytes are sent uncompressed. Worthwhile for remote viewers, not for localhost
+    """
+    global COMPRESSION, COMPRESSION_THRESHOLD
+    COMPRESSION = codec
+    if threshold is not None:
+        COMPRESSION_THRESHOLD = threshold
 
-            if reply["result"] == "success":
-                print("done")
-            else:
-                print("\n", reply["msg"])
-            break
 
-        retries_left -= 1
+def set_shared_memory(value=True):
+    """Pass large arrays through shared memory instead of the socket (used only if the viewer can map them)"""
+    global SHARED_MEMORY
+    if value and not shm.available():
+        raise RuntimeError("Shared memory transport needs Python 3.8 or newer")
+    SHARED_MEMORY = value
+    CONNECTION.reset()
 
-        # Socket is confused. Close and remove it.
-        socket.setsockopt(zmq.LINGER, 0)
-        socket.close()
-        if retries_left == 0:
-            break
 
-        print("Reconnecting to server…")
-        # Create new connection
-        socket = connect(context)
+class Connection:
+    """Persistent REQ connection to the viewer
 
-        print("Resending ...")
-        socket.send(msg)
+    Context and socket are created lazily on first use and reused for all requests.
+    A request without reply follows the lazy pirate pattern: close the confused socket,
+    reconnect and resend. After final failure the socket is dropped and recreated with the next request.
+    """
+
+    def __init__(self):
+        self.context = None
+        self.socket = None
+        self.endpoint = None
+        self.codecs = None
+        self.shared_memory = False
+        self.lock = threading.Lock()
+
+    def _connect(self):
+        if self.context is None:
+            self.context = zmq.Context()
+        self.endpoint = f"tcp://localhost:{ZMQ_PORT}"
+        self.socket = self.context.socket(zmq.REQ)
+        self.socket.connect(self.endpoint)
+
+    def _reset(self):
+        if self.socket is not None:
+            self.socket.setsockopt(zmq.LINGER, 0)
+            self.socket.close()
+            self.socket = None
+            # the viewer maps shared memory per connection, so a new socket has to say hello again
+            self.codecs = None
+
+    def reset(self):
+        with self.lock:
+            self._reset()
+            self.codecs = None
+
+    def close(self):
+        with self.lock:
+            self._reset()
+            if self.context is not None:
+                self.context.term()
+                self.context = None
+
+    def request(self, msg, retries=3, timeout=None):
+        """Send a multipart message and return the JSON reply, or None if the viewer did not answer"""
+        timeout = REQUEST_TIMEOUT if timeout is None else timeout
+
+        with self.lock:
+            if self.socket is None or self.endpoint != f"tcp://localhost:{ZMQ_PORT}":
+                self._reset()
+                self._connect()
+
+            try:
+                self.socket.send_multipart(msg, copy=False)
+
+                retries_left = retries
+                while True:
+                    if (self.socket.poll(timeout) & zmq.POLLIN) != 0:
+                        return self.socket.recv_json()
+
+                    retries_left -= 1
+
+                    # Socket is confused. Close and remove it.
+                    self._reset()
+                    if retries_left == 0:
+                        return None
+
+                    print("Reconnecting to server…")
+                    self._connect()
+
+                    print("Resending ...")
+                    self.socket.send_multipart(msg, copy=False)
+
+            except BaseException:
+                # e.g. interrupted while waiting: the REQ socket would be stuck in the wrong state
+                self._reset()
+                raise
+
+    def open_stream(self, window=None, timeout=None):
+        with self.lock:
+            if self.context is None:
+                self.context = zmq.Context()
+        window = STREAM_WINDOW if window is None else window
+        timeout = 3 * REQUEST_TIMEOUT if timeout is None else timeout
+        return Stream(self.context, f"tcp://localhost:{ZMQ_PORT}", window, timeout)
+
+    def is_alive(self, timeout=500):
+        reply = self.request(to_frames({"type": "ping"}), retries=1, timeout=timeout)
+        return reply is not None and reply.get("result") == "success"
+
+    def _hello(self):
+        # ask the viewer once per connection for its codecs and whether it can map our shared memory
+        if self.codecs is not None and self.endpoint == f"tcp://localhost:{ZMQ_PORT}":
+            return True
+
+        probe = shm.probe() if SHARED_MEMORY else None
+        try:
+            msg = {"type": "hello", "shm_probe": None if probe is None else probe.segments[0].name}
+            reply = self.request(to_frames(msg), retries=1)
+        finally:
+            if probe is not None:
+                probe.release()
+
+        if reply is None:
+            return False
+        # viewers without handshake answer with an error: send uncompressed and inline
+        self.codecs = reply.get("codecs", [])
+        self.shared_memory = reply.get("shm", False)
+        return True
+
+    def codec(self):
+        """Codec to use for COMPRESSION"""
+        if COMPRESSION is None or not self._hello():
+            return None
+        return select_codec(self.codecs, COMPRESSION)
+
+    def segments(self):
+        """Shared memory segments for one request, None if SHARED_MEMORY is off or the viewer cannot map them"""
+        if not SHARED_MEMORY or not self._hello() or not self.shared_memory:
+            return None
+        return shm.Segments()
+
+
+class Stream:
+    """DEALER connection for one streamed transfer
+
+    Up to window messages are sent without waiting for their replies, sending blocks while the window is full.
+    Messages carry the empty delimiter frame of REQ sockets, so the viewer handles both alike
+    """
+
+    def __init__(self, context, endpoint, window, timeout):
+        self.socket = context.socket(zmq.DEALER)
+        self.socket.connect(endpoint)
+        self.window = window
+        self.timeout = timeout
+        self.in_flight = 0
+
+    def send(self, msg):
+        """Send a multipart message and return the replies received while waiting for a free slot
+
+        If the viewer does not answer in time, the message is not sent and the replies end with None
+        """
+        replies = []
+        while self.in_flight >= self.window:
+            reply = self.receive()
+            replies.append(reply)
+            if reply is None:
+                return replies
+        self.socket.send_multipart([b""] + msg, copy=False)
+        self.in_flight += 1
+        return replies
+
+    def hello(self):
+        """Let the viewer check the shared memory probe on this connection, True if it can map our segments"""
+        probe = shm.probe()
+        try:
+            self.send(to_frames({"type": "hello", "shm_probe": probe.segments[0].name}))
+            reply = self.receive()
+        finally:
+            probe.release()
+        return reply is not None and reply.get("shm", False)
+
+    def receive(self, timeout=None):
+        """Wait for the next reply, None if the viewer did not answer in time (the stream is unusable then)"""
+        if (self.socket.poll(self.timeout if timeout is None else timeout) & zmq.POLLIN) == 0:
+            return None
+        frames = self.socket.recv_multipart()
+        self.in_flight -= 1
+        return json.loads(frames[-1])
+
+    def close(self):
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.close()
+
+
+CONNECTION = Connection()
+atexit.register(CONNECTION.close)
+
+
+def is_alive(timeout=500):
+    return CONNECTION.is_alive(timeout)
+
+
+def get_stats(timeout=None):
+    """Metrics of the viewer (counters, sizes and percentiles over the last requests), None if not reachable"""
+    reply = CONNECTION.request(to_frames({"type": "stats"}), retries=1, timeout=timeout)
+    if reply is None or reply.get("result") != "success":
+        return None
+    return reply["stats"]
+
+
+def print_stats(timeout=None):
+    stats = get_stats(timeout)
+    if stats is None:
+        print("viewer not reachable")
+        return
+
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            value = ", ".join(f"{k}={v:.4g}" if isinstance(v, float) else f"{k}={v}" for k, v in value.items())
+        elif isinstance(value, float):
+            value = f"{value:.4g}"
+        print(f"{key:16s} {value}")
+
+
+class AsyncSender:
+    """Background sender with latest-wins semantics
+
+    Only one update is pending at any time. A newer update replaces a pending one (whose future
+    gets cancelled) while the previous one is still in flight.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.pending = None
+        self.latest = None
+        self.thread = None
+
+    def submit(self, data):
+        future = Future()
+        with self.condition:
+            if self.pending is not None:
+                _, superseded, _ = self.pending
+                superseded.cancel()
+            self.pending = (data, future, time.time())
+            self.latest = future
+
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+            self.condition.notify()
+        return future
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.pending is None:
+                    self.condition.wait()
+                data, future, queued = self.pending
+                self.pending = None
+
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                start = time.time()
+                reply = deliver(data)
+                end = time.time()
+                if reply is None:
+                    reply = {"result": "error", "msg": "viewer not reachable"}
+                reply["queued"] = start - queued
+                reply["duration"] = end - start
+                future.set_result(reply)
+            except Exception as ex:
+                future.set_exception(ex)
+
+    def flush(self, timeout=None):
+        """Wait until the latest update has been delivered"""
+        with self.condition:
+            latest = self.latest
+        if latest is not None:
+            wait([latest], timeout)
+
+
+ASYNC_SENDER = AsyncSender()
+# registered after CONNECTION.close, hence runs before it: the last update of a script is not lost
+atexit.register(ASYNC_SENDER.flush, 3 * REQUEST_TIMEOUT / 1000)
+
+
+def _add_stats(total, stats):
+    total["codec"] = stats["codec"]
+    for key in ("raw_bytes", "sent_bytes", "shared_bytes", "compress_time"):
+        total[key] = total.get(key, 0) + stats[key]
+
+
+def deliver_stream(data, progress=None):
+    """Stream shapes to the viewer and return its final reply (None if the viewer is not reachable)
+
+    The first message holds the tree with all meshes replaced by their hashes. Every mesh the viewer
+    reports missing follows in its own message, the viewer acknowledges each with its progress
+    which is handed to progress(received, total). The reply gets the summed transfer statistics
+    """
+    codec = CONNECTION.codec()
+    segments = CONNECTION.segments()
+    total = {}
+
+    def frames(obj):
+        stats = {}
+        msg = to_frames(obj, codec, COMPRESSION_THRESHOLD, stats, None if segments is None else segments.put)
+        _add_stats(total, stats)
+        return msg
+
+    def finished(reply):
+        # a timeout (None), an error or the reply after rendering end the stream
+        if reply is None or reply["result"] != "success" or reply.get("done"):
+            return True
+        if progress is not None:
+            progress(reply["received"], reply["total"])
+        return False
+
+    shapes = data["data"]["shapes"]
+    add_hashes(shapes)
+    stream_id = uuid.uuid4().hex
+
+    stream = CONNECTION.open_stream()
+    try:
+        if segments is not None and not stream.hello():
+            # shared memory is negotiated per connection, the stream has its own
+            segments.release()
+            segments = None
+
+        start = {
+            **data,
+            "type": "stream_start",
+            "stream": stream_id,
+            "data": {**data["data"], "shapes": with_refs(shapes)},
+        }
+        stream.send(frames(start))
+        # without missing meshes the viewer renders before it replies
+        reply = stream.receive(RENDER_TIMEOUT)
+        if reply is not None and reply["result"] == "missing":
+            meshes = {leaf["hash"]: leaf["shape"] for leaf in leaves(shapes)}
+            done = False
+            for key in reply["hashes"]:
+                chunk = {"type": "stream_chunk", "stream": stream_id, "hash": key, "shape": meshes[key]}
+                for reply in stream.send(frames(chunk)):
+                    done = finished(reply)
+                    if done:
+                        break
+                if done:
+                    break
+            # the ack of the last mesh arrives after rendering
+            while not done and stream.in_flight > 0:
+                reply = stream.receive(RENDER_TIMEOUT)
+                done = finished(reply)
+            if not done:
+                reply = None
+    finally:
+        stream.close()
+        if segments is not None:
+            segments.release()
+
+    if reply is not None:
+        reply["transfer"] = total
+    return reply
+
+
+def deliver(data, progress=None):
+    """Send data to the viewer and return its reply (None if the viewer is not reachable)
+
+    For shapes only content hashes are sent first, full meshes only for the hashes the viewer reports missing.
+    The reply gets the transfer statistics (sizes, codec and compression time) of the last request
+    """
+    if STREAM and data.get("type") == "data":
+        return deliver_stream(data, progress)
+
+    codec = CONNECTION.codec()
+    segments = CONNECTION.segments()
+    stats = {}
+
+    def request(obj):
+        # header frame plus raw (or compressed) array frames, uncompressed mesh buffers are not copied.
+        # Shared segments are unlinked after the reply, the viewer keeps its mapping as long as needed
+        share = None if segments is None else segments.put
+        reply = CONNECTION.request(to_frames(obj, codec, COMPRESSION_THRESHOLD, stats, share))
+        if reply is not None:
+            reply["transfer"] = dict(stats)
+        return reply
+
+    try:
+        if data.get("type") != "data":
+            return request(data)
+
+        shapes = data["data"]["shapes"]
+        add_hashes(shapes)
+
+        reply = request({**data, "data": {**data["data"], "shapes": with_refs(shapes)}})
+        if reply is not None and reply["result"] == "missing":
+            missing = set(reply["hashes"])
+            reply = request({**data, "data": {**data["data"], "shapes": with_refs(shapes, missing)}})
+        if reply is not None and reply["result"] == "missing":
+            # meshes referenced in the second request were evicted meanwhile (other clients or a model
+            # larger than the mesh store), so send all of them
+            reply = request(data)
+        return reply
+    finally:
+        if segments is not None:
+            segments.release()
+
+
+def send(data):
+    print(" sending ... ", end="")
+
+    def progress(received, total):
+        print(f"\r sending ... {received}/{total} ", end="", flush=True)
+
+    reply = deliver(data, progress)
+    if reply is None:
+        print("\n viewer not reachable")
+    elif reply["result"] == "success":
+        transfer = reply["transfer"]
+        inline_bytes = transfer["raw_bytes"] - transfer["shared_bytes"]
+        if transfer["sent_bytes"] < inline_bytes:
+            ratio = inline_bytes / transfer["sent_bytes"]
+            print(f"done ({transfer['codec']}: ratio {ratio:.2f}, {transfer['compress_time']:.3f} s)")
+        else:
+            print("done")
+    else:
+        print()
+        warn(f"Viewer error: {reply.get('msg', reply['result'])}")
+
+
+def send_async(data):
+    """Queue data for the viewer and return a future resolving to the reply (with "queued" and "duration" in sec)"""
+    return ASYNC_SENDER.submit(data)
 
 
 class Progress:
@@ -160,13 +589,18 @@ def show(*cad_objs, **kwargs):
     - display:           Select display: "sidecar", "cell", "html"
     - tools:             Show the viewer tools like the object tree
     - timeit:            Show rendering times, levels = False, 0,1,2,3,4,5 (default=False)
+    - asynchronous:      Return a future immediately and send in the background, only the newest
+                         pending update gets sent (default=set_async(...) setting)
 
     For example isometric projection can be achieved in two ways:
     - position = (1, 1, 1)
     - position = (0, 0, 1) and rotation = (45, 35.264389682, 0)
     """
 
+    asynchronous = kwargs.pop("asynchronous", None)
     data = _convert(*cad_objs, **kwargs)
+    if ASYNC if asynchronous is None else asynchronous:
+        return send_async(data)
     send(data)
 
 
@@ -176,6 +610,23 @@ def show_object(obj, **kwargs):
     show(PartGroup(OBJECTS), **kwargs)
 
 
+def save_scene(filename, *cad_objs, codec=None, **kwargs):
+    """Tessellate CAD objects like show(...) and save the result as a scene bundle
+
+    Use codec=None for memory-mappable arrays or e.g. codec="zlib" for smaller files.
+    """
+    _save_scene(filename, _convert(*cad_objs, **kwargs), codec)
+
+
+def open_scene(filename, **kwargs):
+    """Let the viewer load and show a scene bundle directly from disk, without CadQuery or tessellation
+
+    The file needs to be accessible by the viewer; kwargs override the saved config.
+    Remote clients can only open scenes below the scene directory of the viewer (jcv -s <scene dir>)
+    """
+    send({"type": "open", "filename": os.path.abspath(filename), "config": kwargs})
+
+
 def reset():
     global OBJECTS
 
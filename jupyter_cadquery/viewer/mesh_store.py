@@ -0,0 +1,139 @@
+#
+# Copyright 2021 Bernhard Walter
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from collections import OrderedDict
+import hashlib
+
+import numpy as np
+
+#
+# Delta updates between client and viewer
+# Every leaf of the shapes tree gets a content hash of its mesh. The client first sends the tree with
+# all meshes replaced by their hashes, the viewer answers with the hashes it does not hold, and only
+# those meshes are sent in full.
+#
+
+
+def leaves(shapes):
+    for part in shapes["parts"]:
+        if part.get("parts") is None:
+            yield part
+        else:
+            yield from leaves(part)
+
+
+def content_hash(obj):
+    digest = hashlib.blake2b(digest_size=16)
+
+    def update(o):
+        if isinstance(o, np.ndarray):
+            digest.update(f"a{o.dtype.str}{o.shape}".encode())
+            digest.update(np.ascontiguousarray(o).data)
+        elif isinstance(o, dict):
+            digest.update(f"d{len(o)}".encode())
+            for k in sorted(o):
+                digest.update(str(k).encode())
+                update(o[k])
+        elif isinstance(o, (list, tuple)):
+            digest.update(f"l{len(o)}".encode())
+            for v in o:
+                update(v)
+        else:
+            digest.update(repr(o).encode())
+
+    update(obj)
+    return digest.hexdigest()
+
+
+def add_hashes(shapes):
+    for leaf in leaves(shapes):
+        if leaf.get("hash") is None:
+            leaf["hash"] = content_hash((leaf["type"], leaf["shape"]))
+
+
+def with_refs(shapes, keep=None):
+    """Copy of the shapes tree where meshes are replaced by their hash, except for hashes in keep"""
+    keep = keep or ()
+    parts = []
+    for part in shapes["parts"]:
+        if part.get("parts") is None:
+            parts.append(part if part["hash"] in keep else {**part, "shape": None})
+        else:
+            parts.append(with_refs(part, keep))
+    return {**shapes, "parts": parts}
+
+
+def nbytes(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    elif isinstance(obj, dict):
+        return sum(nbytes(v) for v in obj.values())
+    elif isinstance(obj, (list, tuple)):
+        return sum(nbytes(v) for v in obj)
+    else:
+        return 0
+
+
+class MeshStore(object):
+    """Bounded LRU store of meshes keyed by content hash"""
+
+    def __init__(self, max_bytes=512 * 1024 ** 2):
+        self.max_bytes = max_bytes
+        self.meshes = OrderedDict()
+        self.size = 0
+
+    def __len__(self):
+        return len(self.meshes)
+
+    def get(self, key):
+        mesh = self.meshes.get(key)
+        if mesh is not None:
+            self.meshes.move_to_end(key)
+            return mesh[0]
+        return None
+
+    def put(self, key, shape):
+        if key in self.meshes:
+            self.meshes.move_to_end(key)
+            return
+
+        size = nbytes(shape)
+        self.meshes[key] = (shape, size)
+        self.size += size
+        while self.size > self.max_bytes and len(self.meshes) > 1:
+            _, (_, old_size) = self.meshes.popitem(last=False)
+            self.size -= old_size
+
+    def resolve(self, shapes):
+        """Store all sent meshes, fill in all referenced ones and return the hashes that are missing"""
+        missing = []
+        for leaf in leaves(shapes):
+            key = leaf.get("hash")
+            if key is None:
+                continue
+            if leaf["shape"] is not None:
+                self.put(key, leaf["shape"])
+            else:
+                shape = self.get(key)
+                if shape is None:
+                    missing.append(key)
+                else:
+                    leaf["shape"] = shape
+        return missing
+
+    def clear(self):
+        self.meshes = OrderedDict()
+        self.size = 0
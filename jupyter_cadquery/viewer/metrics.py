@@ -0,0 +1,67 @@
+#
+# Copyright 2021 Bernhard Walter
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from collections import deque
+import threading
+import time
+
+import numpy as np
+
+PERCENTILES = (50, 90, 99)
+
+
+class Metrics(object):
+    """Thread safe counters and rolling windows of the viewer server
+
+    Counters accumulate since start, samples (e.g. decode or render times) are kept for the
+    last window values only and reported as percentiles.
+    """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self.lock = threading.Lock()
+        self.start = time.time()
+        self.counters = {}
+        self.samples = {}
+        self.values = {}
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def sample(self, name, value):
+        with self.lock:
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = self.samples[name] = deque(maxlen=self.window)
+            samples.append(value)
+
+    def set(self, name, value):
+        with self.lock:
+            self.values[name] = value
+
+    def summary(self):
+        with self.lock:
+            result = {"uptime": time.time() - self.start, **self.counters, **self.values}
+            for name, samples in self.samples.items():
+                values = np.array(samples)
+                result[name] = {
+                    "n": len(values),
+                    "mean": float(values.mean()),
+                    "max": float(values.max()),
+                    **{f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))},
+                }
+        return result
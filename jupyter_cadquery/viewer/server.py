@@ -1,9 +1,9 @@
-import base64
-import base64
 from datetime import datetime
 from time import localtime
+import ipaddress
+import json
 import os
-import pickle
+import queue
 import threading
 import time
 import zmq
@@ -13,10 +13,19 @@ import ipywidgets as widgets
 from jupyter_cadquery.cad_display import CadqueryDisplay
 from jupyter_cadquery.cad_animation import Animation
 from jupyter_cadquery.defaults import get_default, get_defaults, split_args, set_defaults
-from jupyter_cadquery.logo import LOGO_DATA
+from jupyter_cadquery.logo import get_logo
+from jupyter_cadquery.scene import load_scene
+from jupyter_cadquery.serialize import available_codecs, from_frames
+from jupyter_cadquery.viewer.mesh_store import MeshStore, leaves
+from jupyter_cadquery.viewer.metrics import Metrics
+from jupyter_cadquery.viewer import shm
 from jupyter_cadquery.utils import px
 
 VIEWER = None
+# streams without a new chunk for this many seconds are dropped
+STREAM_TIMEOUT = 60
+# milliseconds the receiver thread waits for messages before it checks whether it should stop
+POLL_TIMEOUT = 200
 
 
 def _log(typ, *msg):
@@ -48,15 +57,45 @@ def debug(*msg):
 
 
 class Viewer:
-    def __init__(self, zmq_port):
+    def __init__(self, zmq_port, scene_dir=None):
         self.zmq_port = zmq_port
+        # scenes of remote clients can only be opened from here, local clients may open any scene
+        self.scene_dir = None if scene_dir is None else os.path.realpath(scene_dir)
         self.cad_display = None
         self.interactive = None
         self.zmq_server = None
+        self.context = None
+        self.receiver_thread = None
+        self.worker_thread = None
+        self.stopping = threading.Event()
         self.root_group = None
+        self.requests = queue.Queue()
+        self.streams = {}
+        self.mesh_store = MeshStore()
+        self.metrics = Metrics()
+        self.segments = shm.MappedSegments() if shm.available() else None
+        # identities of the connections that passed the shared memory probe
+        self.shm_clients = set()
         self.log_output = widgets.Output(layout=widgets.Layout(height="400px", overflow="scroll"))
         self.log_output.add_class("mac-scrollbar")
 
+    def _may_open(self, filename, peer):
+        if self.scene_dir is not None:
+            path = os.path.realpath(filename)
+            try:
+                return os.path.commonpath([path, self.scene_dir]) == self.scene_dir
+            except ValueError:
+                # e.g. different drives on Windows
+                return False
+
+        try:
+            address = ipaddress.ip_address(peer)
+        except ValueError:
+            return False
+        if address.version == 6 and address.ipv4_mapped is not None:
+            address = address.ipv4_mapped
+        return address.is_loopback
+
     def _display(self, data, logo=False):
         mesh_data = data["data"]
         config = data["config"]
@@ -105,11 +144,69 @@ class Viewer:
         self.cad_display.info.ready_msg(self.cad_display.cq_view.grid.step)
         self.root_group = self.cad_display.root_group
 
+    def _render(self, data):
+        t = time.time()
+        self._display(data)
+        self.metrics.sample("render_time", time.time() - t)
+        self.metrics.set("widgets", self.cad_display.widget_stats())
+
+    def stats(self):
+        """Counters, current sizes and percentiles of payload sizes and timings"""
+        stats = self.metrics.summary()
+        stats["queue_length"] = self.requests.qsize()
+        stats["pending_streams"] = len(self.streams)
+        stats["mesh_store"] = {"meshes": len(self.mesh_store), "bytes": self.mesh_store.size}
+        stats["shared_segments"] = 0 if self.segments is None else len(self.segments)
+        return stats
+
+    def _start_stream(self, data):
+        """Keep a streamed tree until all its missing meshes arrived, returns the missing hashes"""
+        now = time.time()
+        for stream_id in [k for k, v in self.streams.items() if now - v["touched"] > STREAM_TIMEOUT]:
+            warn(f"dropping stale stream {stream_id}")
+            del self.streams[stream_id]
+
+        missing = self.mesh_store.resolve(data["data"]["shapes"])
+        if missing:
+            self.streams[data["stream"]] = {
+                "data": data,
+                "meshes": {},
+                "missing": set(missing),
+                "start": now,
+                "touched": now,
+            }
+            self.cad_display.init_progress(len(missing))
+        return missing
+
+    def _add_chunk(self, data):
+        """Add a streamed mesh, returns the stream and whether it is complete"""
+        stream = self.streams.get(data["stream"])
+        if stream is None:
+            raise KeyError(f"Unknown stream {data['stream']}")
+
+        # meshes are kept with the stream, the size bounded mesh store could evict them before the end
+        stream["meshes"][data["hash"]] = data["shape"]
+        stream["missing"].discard(data["hash"])
+        stream["touched"] = time.time()
+        self.cad_display.progress.update()
+
+        if stream["missing"]:
+            return stream, False
+
+        del self.streams[data["stream"]]
+        for key, shape in stream["meshes"].items():
+            self.mesh_store.put(key, shape)
+        for leaf in leaves(stream["data"]["data"]["shapes"]):
+            if leaf["shape"] is None:
+                leaf["shape"] = stream["meshes"][leaf["hash"]]
+        return stream, True
+
     def start_viewer(self, cad_width, cad_height, theme):
         info(f"zmq_port:   {self.zmq_port}")
         info(f"theme:      {theme}")
         info(f"cad_width:  {cad_width}")
         info(f"cad_height: {cad_height}")
+        info(f"scene_dir:  {self.scene_dir}")
 
         set_defaults(theme=theme, cad_width=cad_width, height=cad_height)
 
@@ -126,14 +223,16 @@ class Viewer:
         self.log_view.selected_index = None
         display(widgets.VBox([cad_view, self.interactive, self.log_view]))
 
-        logo = pickle.loads(base64.b64decode(LOGO_DATA))
-        self._display(logo, True)
-        self.cad_display.splash = True
+        logo = get_logo()
+        if logo is not None:
+            self._display(logo, True)
+            self.cad_display.splash = True
 
         stop_viewer()
 
-        context = zmq.Context()
-        socket = context.socket(zmq.REP)
+        context = self.context = zmq.Context()
+        # ROUTER accepts several REQ clients at once, every request carries the identity of its client
+        socket = context.socket(zmq.ROUTER)
         for i in range(5):
             try:
                 socket.bind(f"tcp://*:{self.zmq_port}")
@@ -142,38 +241,208 @@ class Viewer:
                 print(f"{ex}: retrying ... ")
                 time.sleep(1)
 
+        # replies of the UI worker are handed back to the socket thread, zmq sockets are not thread safe
+        replies = context.socket(zmq.PULL)
+        replies.bind("inproc://replies")
+
         self.zmq_server = socket
+        self.stopping.clear()
         info("zmq started\n")
 
-        def return_error(error_msg):
-            error(error_msg)
-            socket.send_json({"result": "error", "msg": error_msg})
+        def client_name(identity):
+            return identity.hex()[-8:]
+
+        def reply_json(identity, msg):
+            # socket thread only
+            socket.send_multipart([identity, b"", json.dumps(msg).encode()])
 
-        def return_success(t):
-            info(f"duration: {time.time() - t:7.2f}")
-            socket.send_json({"result": "success"})
+        def receiver():
+            # Decodes the next payload while the UI worker is still rendering the current one.
+            # Cheap requests are answered here, without queueing behind renderings
+            poller = zmq.Poller()
+            poller.register(socket, zmq.POLLIN)
+            poller.register(replies, zmq.POLLIN)
 
-        def msg_handler():
             while True:
-                msg = socket.recv()
+                events = dict(poller.poll(POLL_TIMEOUT))
+                if self.stopping.is_set():
+                    # sockets are closed by the thread using them, see stop_viewer
+                    socket.close(linger=0)
+                    replies.close(linger=0)
+                    break
+
+                if replies in events:
+                    identity, reply = replies.recv_multipart()
+                    socket.send_multipart([identity, b"", reply])
+
+                if socket not in events:
+                    continue
+
+                frames = socket.recv_multipart(copy=False)
+                # envelope: client identity, empty delimiter, message frames
+                identity = frames[0].bytes
+                payload_bytes = sum(len(frame) for frame in frames[2:])
+                self.metrics.count("messages")
+                self.metrics.count("payload_bytes", payload_bytes)
                 try:
-                    data = pickle.loads(msg)
+                    # arrays are rebuilt with np.frombuffer on the received frames, no pickle involved
+                    t = time.time()
+                    stats = {}
+                    # shared segments are only mapped for connections that negotiated them in hello
+                    attach = None if identity not in self.shm_clients else self.segments.attach
+                    data = from_frames([frame.buffer for frame in frames[2:]], stats=stats, attach=attach)
+                    self.metrics.sample("decode_time", time.time() - t)
+                    self.metrics.sample("message_bytes", payload_bytes)
                 except Exception as ex:
-                    return_error(str(ex))
+                    self.metrics.count("errors")
+                    error_msg = f"Cannot decode message: {type(ex).__name__}: {ex}"
+                    error(error_msg)
+                    reply_json(identity, {"result": "error", "msg": error_msg})
                     continue
 
+                inline_bytes = stats["raw_bytes"] - stats["shared_bytes"]
+                if stats["sent_bytes"] < inline_bytes:
+                    info(
+                        f"received {stats['sent_bytes']} of {inline_bytes} bytes "
+                        f"(ratio {inline_bytes / stats['sent_bytes']:.2f}), "
+                        f"decompressed in {stats['decompress_time']:.3f} s"
+                    )
+                if stats["shared_bytes"] > 0:
+                    self.metrics.count("shared_bytes", stats["shared_bytes"])
+
+                if self.segments is not None:
+                    # close segments of earlier messages whose arrays are gone
+                    self.segments.collect()
+
+                if data.get("type") == "ping":
+                    reply_json(identity, {"result": "success"})
+
+                elif data.get("type") == "hello":
+                    # compression handshake: tell the client which codecs can be decoded here
+                    # and whether the shared memory probe of the client can be mapped (same host)
+                    shared_memory = self.segments is not None and shm.check_probe(data.get("shm_probe"))
+                    if shared_memory:
+                        self.shm_clients.add(identity)
+                    else:
+                        self.shm_clients.discard(identity)
+                    reply = {"result": "success", "codecs": available_codecs(), "shm": shared_memory}
+                    reply_json(identity, reply)
+
+                elif data.get("type") == "stats":
+                    # answered here so that monitoring is not queued behind renderings
+                    reply_json(identity, {"result": "success", "stats": self.stats()})
+
+                elif data.get("type") == "open" and not self._may_open(
+                    data.get("filename", ""), frames[0].get("Peer-Address")
+                ):
+                    self.metrics.count("errors")
+                    error_msg = f"Cannot open {data.get('filename')}: not allowed for this client"
+                    error(f"[{client_name(identity)}] {error_msg}")
+                    reply_json(identity, {"result": "error", "msg": error_msg})
+
+                else:
+                    # A REQ client has at most one request in flight, a stream at most its window of chunks,
+                    # so the queue is bounded by the clients and their stream windows
+                    self.requests.put((identity, data, time.time()))
+
+        def worker():
+            # The only thread mutating widgets: requests of all clients are rendered one after the other
+            push = context.socket(zmq.PUSH)
+            push.connect("inproc://replies")
+
+            def send_json(identity, msg):
+                try:
+                    push.send_multipart([identity, json.dumps(msg).encode()], zmq.NOBLOCK)
+                except zmq.Again:
+                    # the receiver thread has stopped, nobody is left to forward the reply
+                    pass
+
+            def return_error(identity, error_msg):
+                self.metrics.count("errors")
+                error(f"[{client_name(identity)}] {error_msg}")
+                send_json(identity, {"result": "error", "msg": error_msg})
+
+            def return_success(identity, t):
+                info(f"[{client_name(identity)}] duration: {time.time() - t:7.2f}")
+                send_json(identity, {"result": "success"})
+
+            while True:
+                request = self.requests.get()
+                if request is None:
+                    # sent by stop_viewer
+                    push.close(linger=0)
+                    break
+
+                identity, data, queued = request
+                self.metrics.sample("queue_time", time.time() - queued)
+
                 self.interactive.outputs = ()
                 self.interactive.layout.height = f"0px"
 
                 if data.get("type") == "data":
                     try:
                         t = time.time()
-                        self._display(data)
-                        return_success(t)
+                        missing = self.mesh_store.resolve(data["data"]["shapes"])
+                        if missing:
+                            info(f"[{client_name(identity)}] requesting {len(missing)} missing meshes")
+                            send_json(identity, {"result": "missing", "hashes": missing})
+                            continue
+
+                        self._render(data)
+                        return_success(identity, t)
+
+                    except Exception as ex:
+                        error_msg = f"{type(ex).__name__}: {ex}"
+                        return_error(identity, error_msg)
+
+                elif data.get("type") == "open":
+                    try:
+                        t = time.time()
+                        # meshes are memory mapped and only read when rendered
+                        scene = load_scene(data["filename"])
+                        scene["config"].update({k: v for k, v in data.get("config", {}).items() if v is not None})
+                        info(f"[{client_name(identity)}] opened {data['filename']}")
+                        self._render(scene)
+                        return_success(identity, t)
+
+                    except Exception as ex:
+                        error_msg = f"{type(ex).__name__}: {ex}"
+                        return_error(identity, error_msg)
+
+                elif data.get("type") == "stream_start":
+                    try:
+                        t = time.time()
+                        missing = self._start_stream(data)
+                        if missing:
+                            info(f"[{client_name(identity)}] streaming {len(missing)} meshes")
+                            send_json(identity, {"result": "missing", "hashes": missing})
+                            continue
+
+                        self._render(data)
+                        info(f"[{client_name(identity)}] duration: {time.time() - t:7.2f}")
+                        send_json(identity, {"result": "success", "done": True})
 
                     except Exception as ex:
                         error_msg = f"{type(ex).__name__}: {ex}"
-                        return_error(error_msg)
+                        return_error(identity, error_msg)
+
+                elif data.get("type") == "stream_chunk":
+                    try:
+                        stream, complete = self._add_chunk(data)
+                        total = len(stream["meshes"]) + len(stream["missing"])
+                        if not complete:
+                            received = len(stream["meshes"])
+                            send_json(identity, {"result": "success", "received": received, "total": total})
+                            continue
+
+                        self._render(stream["data"])
+                        info(f"[{client_name(identity)}] duration: {time.time() - stream['start']:7.2f}")
+                        send_json(identity, {"result": "success", "done": True, "received": total, "total": total})
+
+                    except Exception as ex:
+                        self.streams.pop(data.get("stream"), None)
+                        error_msg = f"{type(ex).__name__}: {ex}"
+                        return_error(identity, error_msg)
 
                 elif data.get("type") == "animation":
                     try:
@@ -203,28 +472,41 @@ class Viewer:
                         }
                         self.interactive.outputs = (mime_data,)
                         self.interactive.layout.height = f"40px"
-                        return_success(t)
+                        return_success(identity, t)
 
                     except Exception as ex:
                         error_msg = f"{type(ex).__name__}: {ex}"
-                        return_error(error_msg)
+                        return_error(identity, error_msg)
                 else:
-                    return_error(f"Wrong message type {data.get('type')}")
+                    return_error(identity, f"Wrong message type {data.get('type')}")
 
-        thread = threading.Thread(target=msg_handler)
-        thread.setDaemon(True)
-        thread.start()
+        self.worker_thread, self.receiver_thread = [threading.Thread(target=target) for target in (worker, receiver)]
+        for thread in (self.worker_thread, self.receiver_thread):
+            thread.setDaemon(True)
+            thread.start()
         self.cad_display.info.add_html("<b>zmq server started</b>")
 
     def stop_viewer(self):
         if self.zmq_server is not None:
             try:
-                self.zmq_server.close()
+                # zmq sockets are not thread safe: signal the threads and let them close their own sockets
+                self.stopping.set()
+                # pending requests are dropped, the worker stops after the current one
+                while True:
+                    try:
+                        self.requests.get_nowait()
+                    except queue.Empty:
+                        break
+                self.requests.put(None)
+                self.receiver_thread.join()
+                self.worker_thread.join()
+                # all sockets are closed now, so term does not block
+                self.context.term()
+                self.context = None
+                self.zmq_server = None
                 info("zmq stopped")
                 if self.cad_display is not None and self.cad_display.info is not None:
                     self.cad_display.info.add_html("<b>HTTP zmq stopped</b>")
-                self.zmq_server = None
-                time.sleep(0.5)
             except Exception as ex:
                 error("Exception %s" % ex)
 
@@ -236,8 +518,12 @@ def start_viewer():
     cad_width = get_default("cad_width") if os.environ.get("CAD_WIDTH") is None else int(os.environ["CAD_WIDTH"])
     cad_height = get_default("height") if os.environ.get("CAD_HEIGHT") is None else int(os.environ["CAD_HEIGHT"])
     theme = get_default("theme") if os.environ.get("THEME") is None else os.environ["THEME"]
+    scene_dir = os.environ.get("SCENE_DIR") or None
 
-    VIEWER = Viewer(zmq_port)
+    if VIEWER is not None:
+        # free the port, the threads and the zmq context of the previous viewer
+        VIEWER.stop_viewer()
+    VIEWER = Viewer(zmq_port, scene_dir)
     VIEWER.start_viewer(cad_width, cad_height, theme)
 
 
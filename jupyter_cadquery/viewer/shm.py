@@ -0,0 +1,128 @@
+#
+# Copyright 2021 Bernhard Walter
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+#
+# Shared memory transport for client and viewer on the same host
+#
+# Lifecycle: the client creates one segment per large array and only sends its name. The viewer maps the
+# segment and keeps it mapped while arrays (e.g. widget buffers or the mesh store) still use it. The client
+# unlinks its segments as soon as the request is answered (or failed), the viewer's mapping stays valid
+# until it is closed. Hence segments only leak if the client process is killed during a request.
+#
+# The viewer only maps segments for connections whose probe (see hello) it could map, so a remote client
+# cannot make the viewer map arbitrary segments of its host.
+#
+
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python < 3.8
+    shared_memory = None
+
+# smaller arrays are sent inline, a segment costs a few system calls
+SHM_THRESHOLD = 256 * 1024
+
+
+def available():
+    return shared_memory is not None
+
+
+def _untrack(segment):
+    # Attaching registers the segment with the resource tracker of this process, which would unlink
+    # it (again) on exit and warn about leaks. The client owns the segment, so drop it from tracking.
+    try:
+        from multiprocessing import resource_tracker
+
+        resource_tracker.unregister(segment._name, "shared_memory")
+    except Exception:
+        pass
+
+
+class Segments(object):
+    """Client side segments of one request"""
+
+    def __init__(self):
+        self.segments = []
+
+    def put(self, buffer, threshold=SHM_THRESHOLD):
+        """Copy an array into a new segment and return the segment name (None if below threshold)"""
+        if buffer.nbytes < threshold:
+            return None
+        # a byte view, memoryview.cast fails for empty arrays with more than one dimension
+        data = np.ascontiguousarray(buffer).reshape(-1).view(np.uint8)
+        segment = shared_memory.SharedMemory(create=True, size=max(1, data.nbytes))
+        segment.buf[: data.nbytes] = data
+        self.segments.append(segment)
+        return segment.name
+
+    def release(self):
+        for segment in self.segments:
+            segment.close()
+            try:
+                segment.unlink()
+            except FileNotFoundError:
+                pass
+        self.segments = []
+
+
+class MappedSegments(object):
+    """Viewer side segments, closed once no array uses them any more"""
+
+    def __init__(self):
+        self.segments = []
+
+    def __len__(self):
+        return len(self.segments)
+
+    def attach(self, name, nbytes):
+        segment = shared_memory.SharedMemory(name=name)
+        _untrack(segment)
+        self.segments.append(segment)
+        return segment.buf[:nbytes]
+
+    def collect(self):
+        """Close all segments without remaining array views, returns the number of segments still mapped"""
+        mapped = []
+        for segment in self.segments:
+            try:
+                segment.close()
+            except BufferError:
+                # still exported to numpy arrays
+                mapped.append(segment)
+        self.segments = mapped
+        return len(mapped)
+
+
+def probe():
+    """Client side test segment, the viewer can only map it if it runs on the same host"""
+    segments = Segments()
+    segments.put(np.frombuffer(b"jcq", dtype=np.uint8), threshold=0)
+    return segments
+
+
+def check_probe(name):
+    """Viewer side: True if the probe segment of the client can be mapped"""
+    if shared_memory is None or name is None:
+        return False
+    try:
+        segment = shared_memory.SharedMemory(name=name)
+    except (FileNotFoundError, OSError, ValueError):
+        return False
+    _untrack(segment)
+    ok = bytes(segment.buf[:3]) == b"jcq"
+    segment.close()
+    return ok
@@ -31,7 +31,6 @@ setup_args = {
         "voila~=0.2",
         "cadquery_massembly~=0.9",
         "orbitcontrol-patch~=0.1.0",
-        "pyquaternion~=0.9.9",
     ],
     "extras_require": {
         "dev": {"jupyter-packaging", "cookiecutter", "twine", "bumpversion", "black", "pylint", "pyYaml"},
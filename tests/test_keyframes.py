@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+animation = pytest.importorskip("jupyter_cadquery.cad_animation")
+reduce_linear, reduce_slerp = animation.reduce_linear, animation.reduce_slerp
+
+
+def interpolate_linear(times, values, keep):
+    return np.stack([np.interp(times, times[keep], values[keep, k]) for k in range(values.shape[1])], axis=1)
+
+
+def interpolate_slerp(times, quats, keep):
+    result = np.empty_like(quats)
+    for i, j in zip(keep[:-1], keep[1:]):
+        result[i] = quats[i]
+        result[i + 1 : j] = animation._slerp(quats[i], quats[j], animation._fractions(times, i, j))
+    result[keep[-1]] = quats[keep[-1]]
+    return result
+
+
+def angles(q1, q2):
+    dots = np.abs(np.sum(q1 * q2, axis=1))
+    return np.degrees(2 * np.arccos(np.minimum(dots, 1.0)))
+
+
+def test_linear_keeps_the_ends_of_a_line():
+    times = np.linspace(0, 4, 41)
+    np.testing.assert_array_equal(reduce_linear(times, 3 * times - 1, 1e-6), [0, 40])
+
+
+def test_linear_keeps_corners():
+    times = np.linspace(0, 4, 41)
+    values = np.stack([np.minimum(times, 2), np.zeros_like(times), times], axis=1)
+    np.testing.assert_array_equal(reduce_linear(times, values, 1e-6), [0, 20, 40])
+
+
+def test_linear_tolerance():
+    times = np.linspace(0, 2 * np.pi, 200)
+    values = np.stack([np.cos(times), np.sin(times), 0.1 * times], axis=1)
+    for tolerance in (0.1, 0.01, 0.001):
+        keep = reduce_linear(times, values, tolerance)
+        assert keep[0] == 0 and keep[-1] == len(times) - 1
+        assert len(keep) < len(times)
+        error = np.linalg.norm(interpolate_linear(times, values, keep) - values, axis=1)
+        assert error.max() <= tolerance
+
+
+def test_linear_short_tracks():
+    np.testing.assert_array_equal(reduce_linear(np.array([0.0]), [1.0], 0.1), [0])
+    np.testing.assert_array_equal(reduce_linear(np.array([0.0, 1.0]), [1.0, 2.0], 0.1), [0, 1])
+
+
+def test_slerp_keeps_the_ends_of_a_uniform_rotation():
+    times = np.linspace(0, 1, 31)
+    quats = animation._from_axis_angle((1, 1, 0), np.linspace(0, 90, 31))
+    np.testing.assert_array_equal(reduce_slerp(times, quats, 1e-3), [0, 30])
+
+
+@pytest.mark.parametrize("tolerance", [1.0, 0.1])
+def test_slerp_tolerance(tolerance):
+    times = np.linspace(0, 1, 100)
+    # rotation around z with a varying speed, tilting around x
+    quats = animation._quat_multiply(
+        animation._from_axis_angle((0, 0, 1), 360 * times**2), animation._from_axis_angle((1, 0, 0), 30 * times)
+    )
+    keep = reduce_slerp(times, quats, tolerance)
+    assert len(keep) < len(times)
+    assert angles(interpolate_slerp(times, quats, keep), quats).max() <= tolerance
+
+
+def test_slerp_splits_half_turns():
+    # every keyframe is a quarter turn, a slerp over two of them would be ambiguous
+    times = np.arange(9.0)
+    quats = animation._from_axis_angle((0, 0, 1), 90 * times)
+    keep = reduce_slerp(times, quats, 1.0)
+    np.testing.assert_array_equal(keep, np.arange(9))
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+cad_objects = pytest.importorskip("jupyter_cadquery.cad_objects")
+compute_normals = cad_objects.compute_normals
+
+
+def area_weighted_normals(vertices, triangles):
+    # reference: sum of the face normals (length twice the area) per vertex, normalized
+    normals = np.zeros((len(vertices), 3))
+    for a, b, c in np.asarray(triangles).reshape(-1, 3):
+        normal = np.cross(vertices[b] - vertices[a], vertices[c] - vertices[a])
+        for i in (a, b, c):
+            normals[i] += normal
+    lengths = np.linalg.norm(normals, axis=1)
+    lengths[lengths == 0] = 1
+    return normals / lengths[:, None]
+
+
+def test_flat_square():
+    vertices = np.array([[0, 0, 0], [2, 0, 0], [2, 1, 0], [0, 1, 0]], dtype=np.float32)
+    triangles = np.array([[0, 1, 2], [0, 2, 3]])
+    normals = compute_normals(vertices, triangles)
+    assert normals.dtype == np.float32
+    np.testing.assert_allclose(normals, [[0, 0, 1]] * 4)
+    # flat triangle indices give the same result
+    np.testing.assert_array_equal(compute_normals(vertices, triangles.ravel()), normals)
+
+
+def test_random_mesh():
+    rng = np.random.default_rng(3)
+    vertices = rng.normal(size=(200, 3)).astype(np.float32)
+    triangles = rng.integers(0, 200, size=(500, 3))
+    normals = compute_normals(vertices, triangles)
+    np.testing.assert_allclose(normals, area_weighted_normals(vertices.astype(np.float64), triangles), atol=1e-5)
+
+
+def test_area_weights():
+    # a small and a large triangle sharing vertex 0
+    vertices = np.array([[0, 0, 0], [0.1, 0, 0], [0, 0.1, 0], [0, 10, 0], [0, 0, 10]], dtype=np.float32)
+    normals = compute_normals(vertices, [[0, 1, 2], [0, 3, 4]])
+    assert normals[0][0] > 0.99
+
+
+def test_unused_vertices():
+    vertices = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [5, 5, 5]], dtype=np.float32)
+    normals = compute_normals(vertices, [[0, 1, 2]])
+    np.testing.assert_array_equal(normals[3], [0, 0, 0])
+    assert np.isfinite(normals).all()
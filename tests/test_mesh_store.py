@@ -0,0 +1,87 @@
+import numpy as np
+
+from jupyter_cadquery.serialize import from_frames, to_frames
+from jupyter_cadquery.viewer.mesh_store import MeshStore, add_hashes, content_hash, leaves, with_refs
+
+
+def mesh(offset, n=4):
+    return {
+        "vertices": np.arange(3 * n, dtype=np.float32) + offset,
+        "triangles": np.arange(n, dtype=np.uint32),
+        "normals": np.ones(3 * n, dtype=np.float32),
+    }
+
+
+def shapes(*offsets):
+    parts = [{"type": "shapes", "name": f"part_{o}", "id": f"/group/part_{o}", "shape": mesh(o)} for o in offsets]
+    # the first part is nested one level deeper
+    sub = {"name": "sub", "id": "/group/sub", "parts": parts[:1]}
+    return {"name": "group", "id": "/group", "parts": [sub] + parts[1:]}
+
+
+def send(obj):
+    # what the viewer receives
+    return from_frames(to_frames(obj))
+
+
+def test_content_hash():
+    assert content_hash(mesh(0)) == content_hash(mesh(0))
+    assert content_hash(mesh(0)) != content_hash(mesh(1))
+    # same bytes, different shape or dtype
+    assert content_hash(np.zeros(6)) != content_hash(np.zeros((2, 3)))
+    assert content_hash(np.zeros(2, dtype=np.float64)) != content_hash(np.zeros(4, dtype=np.float32))
+
+
+def test_with_refs():
+    tree = shapes(0, 1)
+    add_hashes(tree)
+
+    refs = with_refs(tree)
+    assert [leaf["shape"] for leaf in leaves(refs)] == [None, None]
+    assert [leaf["hash"] for leaf in leaves(refs)] == [leaf["hash"] for leaf in leaves(tree)]
+    # the original tree keeps its meshes
+    assert all(leaf["shape"] is not None for leaf in leaves(tree))
+
+    first = next(leaves(tree))["hash"]
+    assert [leaf["shape"] is not None for leaf in leaves(with_refs(tree, {first}))] == [True, False]
+
+
+def test_missing_protocol():
+    store = MeshStore()
+
+    tree = shapes(0, 1)
+    add_hashes(tree)
+    hashes = [leaf["hash"] for leaf in leaves(tree)]
+
+    # unknown meshes are reported missing, then sent in full
+    assert store.resolve(send(with_refs(tree))) == hashes
+    assert store.resolve(send(with_refs(tree, set(hashes)))) == []
+    assert len(store) == 2
+
+    # only the changed mesh is missing for the next version of the model
+    tree = shapes(0, 2)
+    add_hashes(tree)
+    received = send(with_refs(tree))
+    missing = store.resolve(received)
+    assert missing == [list(leaves(tree))[1]["hash"]]
+
+    received = send(with_refs(tree, set(missing)))
+    assert store.resolve(received) == []
+    for leaf, expected in zip(leaves(received), leaves(tree)):
+        np.testing.assert_array_equal(leaf["shape"]["vertices"], expected["shape"]["vertices"])
+
+
+def test_store_is_bounded():
+    size = sum(a.nbytes for a in mesh(0).values())
+    store = MeshStore(max_bytes=2 * size)
+    for i in range(3):
+        store.put(f"h{i}", mesh(i))
+    assert len(store) == 2
+    assert store.size == 2 * size
+    assert store.get("h0") is None
+
+    # get refreshes the entry
+    assert store.get("h1") is not None
+    store.put("h3", mesh(3))
+    assert store.get("h1") is not None
+    assert store.get("h2") is None
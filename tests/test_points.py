@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+cad_objects = pytest.importorskip("jupyter_cadquery.cad_objects")
+voxel_decimate = cad_objects.voxel_decimate
+
+
+def first_per_voxel(points, voxel_size):
+    # reference: one point per voxel, the first one
+    voxels = {}
+    for i, cell in enumerate(np.floor((points - points.min(axis=0)) / voxel_size).astype(np.int64)):
+        voxels.setdefault(tuple(cell), i)
+    return np.array(sorted(voxels.values()))
+
+
+def test_one_point_per_voxel():
+    points = np.array([[0.1, 0.1, 0.1], [0.9, 0.2, 0.3], [1.5, 0.1, 0.1], [0.2, 0.8, 0.4], [1.1, 1.1, 1.1]])
+    np.testing.assert_array_equal(voxel_decimate(points, 1.0), [0, 2, 4])
+
+
+@pytest.mark.parametrize("voxel_size", [0.05, 0.2, 1.0])
+def test_random_points(voxel_size):
+    points = np.random.default_rng(1).normal(size=(5000, 3)).astype(np.float32)
+    index = voxel_decimate(points, voxel_size)
+    np.testing.assert_array_equal(index, first_per_voxel(points, voxel_size))
+
+
+def test_large_extent():
+    # too many voxels for a single int64 key per voxel
+    rng = np.random.default_rng(2)
+    points = rng.uniform(-1e6, 1e6, size=(1000, 3))
+    points = np.concatenate([points, points])
+    index = voxel_decimate(points, 1e-6)
+    np.testing.assert_array_equal(index, first_per_voxel(points, 1e-6))
+    np.testing.assert_array_equal(index, np.arange(1000))
+
+
+def test_single_point():
+    np.testing.assert_array_equal(voxel_decimate(np.ones((1, 3)), 0.1), [0])
@@ -0,0 +1,97 @@
+import random
+
+import pytest
+
+cq = pytest.importorskip("cadquery")
+replay = pytest.importorskip("jupyter_cadquery.cadquery.replay")
+
+
+def to_array_recursive(workplane, level=0, result_name=""):
+    # the recursive implementation to_array replaced, as reference
+    def walk(caller, level=0, result_name=""):
+        stack = [
+            replay.Step(
+                level,
+                func=caller["func"],
+                args=caller["args"],
+                kwargs=caller["kwargs"],
+                result_name=result_name,
+                result_obj=caller["obj"],
+            )
+        ]
+        for child in reversed(caller["children"]):
+            stack = walk(child, level + 1) + stack
+            for arg in child["args"]:
+                if isinstance(arg, cq.Workplane):
+                    result_name = getattr(arg, "name", None)
+                    stack = to_array_recursive(arg, level=level + 2, result_name=result_name) + stack
+        return stack
+
+    stack = []
+
+    obj = workplane
+    while obj is not None:
+        caller = getattr(obj, "_caller", None)
+        result_name = getattr(obj, "name", "")
+        if caller is not None:
+            stack = walk(caller, level, result_name) + stack
+            for arg in caller["args"]:
+                if isinstance(arg, cq.Workplane):
+                    result_name = getattr(arg, "name", "")
+                    stack = to_array_recursive(arg, level=level + 1, result_name=result_name) + stack
+        obj = obj.parent
+
+    return stack
+
+
+def steps(workplane):
+    # building the steps does not need the widgets of a Replay object
+    return object.__new__(replay.Replay).to_array(workplane)
+
+
+def random_workplane(rng, pool, depth):
+    obj = None
+    for i in range(rng.randint(1, 4)):
+        workplane = cq.Workplane()
+        workplane.parent = obj
+        workplane._caller = random_caller(rng, pool, depth, workplane, f"f{i}")
+        if rng.random() < 0.3:
+            workplane.name = f"wp{len(pool)}"
+        pool.append(workplane)
+        obj = workplane
+    return obj
+
+
+def random_caller(rng, pool, depth, obj, func):
+    args = [1]
+    if depth > 0:
+        for _ in range(rng.randint(0, 2)):
+            # workplane arguments are sometimes shared between calls
+            shared = pool and rng.random() < 0.3
+            args.append(rng.choice(pool) if shared else random_workplane(rng, pool, depth - 1))
+    children = []
+    if depth > 0:
+        children = [random_caller(rng, pool, depth - 1, obj, f"{func}_{i}") for i in range(rng.randint(0, 2))]
+    return {"func": func, "args": args, "kwargs": {}, "obj": obj, "children": children}
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_to_array_random_call_trees(seed):
+    workplane = random_workplane(random.Random(seed), [], depth=3)
+    assert steps(workplane) == to_array_recursive(workplane)
+
+
+def test_to_array_traced_model():
+    replay.DEBUG = False
+    replay.wrap_workplane()
+    try:
+        box = cq.Workplane("XY").box(2, 2, 1)
+        box.name = "box"
+        pin = cq.Workplane("XY").circle(0.5).extrude(2)
+        result = box.union(pin).faces(">Z").workplane().hole(0.2).cut(pin.translate((1, 0, 0)))
+    finally:
+        replay.unwrap_workplane()
+
+    result_steps = steps(result)
+    assert len(result_steps) > 5
+    assert result_steps == to_array_recursive(result)
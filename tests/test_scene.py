@@ -0,0 +1,90 @@
+import struct
+import sys
+
+import numpy as np
+import pytest
+
+from jupyter_cadquery.scene import ALIGNMENT, SCENE_MAGIC, SCENE_VERSION, load_scene, save_scene
+
+
+def sample():
+    shape = {
+        "vertices": np.arange(3000, dtype=np.float32),
+        "triangles": np.arange(1000, dtype=np.uint32),
+        "normals": np.zeros(3000, dtype=np.float32),
+        "edges": np.empty((0, 2, 3), dtype=np.float32),
+    }
+    return {
+        "data": {
+            "shapes": {"name": "group", "id": "/group", "parts": [{"name": "box", "type": "shapes", "shape": shape}]},
+            "mapping": {"/group/box": (1, 1)},
+        },
+        "type": "data",
+        "config": {"theme": "dark", "cad_width": None},
+    }
+
+
+def assert_scene(scene):
+    expected = sample()
+    assert scene["config"] == expected["config"]
+    assert scene["data"]["mapping"] == expected["data"]["mapping"]
+    shape = scene["data"]["shapes"]["parts"][0]["shape"]
+    for key, value in expected["data"]["shapes"]["parts"][0]["shape"].items():
+        assert shape[key].dtype == value.dtype
+        assert shape[key].shape == value.shape
+        np.testing.assert_array_equal(shape[key], value)
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_round_trip(tmp_path, mmap):
+    filename = tmp_path / "scene.jcq"
+    save_scene(filename, sample())
+    assert_scene(load_scene(filename, mmap=mmap))
+
+
+def test_mmap_arrays_are_aligned_read_only_views(tmp_path):
+    filename = tmp_path / "scene.jcq"
+    save_scene(filename, sample())
+    shape = load_scene(filename)["data"]["shapes"]["parts"][0]["shape"]
+    for key in ("vertices", "triangles", "normals"):
+        assert shape[key].ctypes.data % ALIGNMENT == 0
+        assert not shape[key].flags.writeable
+
+
+def test_compressed(tmp_path):
+    plain, compressed = tmp_path / "plain.jcq", tmp_path / "compressed.jcq"
+    save_scene(plain, sample())
+    save_scene(compressed, sample(), codec="zlib")
+    assert compressed.stat().st_size < plain.stat().st_size
+    assert_scene(load_scene(compressed))
+
+
+def test_not_a_bundle(tmp_path):
+    filename = tmp_path / "scene.jcq"
+    filename.write_bytes(b"something else")
+    with pytest.raises(ValueError):
+        load_scene(filename)
+
+
+def test_newer_version(tmp_path):
+    filename = tmp_path / "scene.jcq"
+    save_scene(filename, sample())
+    with open(filename, "r+b") as fd:
+        fd.seek(len(SCENE_MAGIC))
+        fd.write(struct.pack("<I", SCENE_VERSION + 1))
+    with pytest.raises(ValueError):
+        load_scene(filename)
+
+
+def test_bounding_boxes_without_ocp(tmp_path):
+    pytest.importorskip("webcolors")
+    from jupyter_cadquery.utils import BoundingBox
+
+    bb = {"xmin": -1, "xmax": 1, "ymin": -2, "ymax": 2, "zmin": 0, "zmax": 3}
+    filename = tmp_path / "scene.jcq"
+    save_scene(filename, {"bb": BoundingBox(bb)})
+
+    scene = load_scene(filename)
+    assert scene["bb"].to_dict() == bb
+    assert scene["bb"].center == (0, 0, 1.5)
+    assert "OCP" not in sys.modules
@@ -0,0 +1,86 @@
+import json
+
+import numpy as np
+import pytest
+
+from jupyter_cadquery.serialize import available_codecs, dumps, from_frames, loads, to_frames
+
+
+def sample():
+    return {
+        "vertices": np.arange(30, dtype=np.float32).reshape(-1, 3),
+        "triangles": np.arange(9, dtype=np.uint32),
+        "normals": np.ones((4, 3))[:, ::2],
+        "edges": np.empty((0, 2, 3), dtype=np.float32),
+        "path": ("root", "box"),
+        "parts": [{"name": "box", "color": "#e8b024", "size": np.float64(1.5)}],
+    }
+
+
+def assert_equal(result, expected):
+    if isinstance(expected, np.ndarray):
+        assert result.dtype == expected.dtype
+        assert result.shape == expected.shape
+        np.testing.assert_array_equal(result, expected)
+    elif isinstance(expected, dict):
+        assert result.keys() == expected.keys()
+        for key in expected:
+            assert_equal(result[key], expected[key])
+    elif isinstance(expected, (list, tuple)):
+        assert type(result) == type(expected)
+        assert len(result) == len(expected)
+        for r, e in zip(result, expected):
+            assert_equal(r, e)
+    else:
+        assert result == expected
+
+
+def test_dumps_loads():
+    header, buffers = dumps(sample())
+    assert all(isinstance(buffer, np.ndarray) for buffer in buffers)
+    assert_equal(loads(header, buffers), sample())
+
+
+def test_frames_round_trip():
+    frames = to_frames(sample())
+    assert len(frames) == 5
+    assert_equal(from_frames(frames), sample())
+
+
+def test_frames_round_trip_bytes():
+    # as received from zmq
+    frames = [bytes(memoryview(frame)) for frame in to_frames(sample())]
+    assert_equal(from_frames(frames), sample())
+
+
+@pytest.mark.parametrize("shape", [(0,), (0, 3), (0, 2, 3), (5, 0, 3)])
+def test_empty_arrays(shape):
+    array = np.empty(shape, dtype=np.float32)
+    assert_equal(from_frames(to_frames({"a": array})), {"a": array})
+
+
+@pytest.mark.parametrize("codec", available_codecs())
+def test_codecs(codec):
+    obj = {"small": np.arange(10, dtype=np.float32), "large": np.zeros((10000, 3), dtype=np.float32)}
+    stats = {}
+    frames = to_frames(obj, codec=codec, threshold=1024, stats=stats)
+
+    message = json.loads(frames[0])
+    assert message["codecs"] == [None, codec]
+    assert stats["sent_bytes"] < stats["raw_bytes"] == obj["small"].nbytes + obj["large"].nbytes
+
+    stats = {}
+    assert_equal(from_frames(frames, stats=stats), obj)
+    assert stats["raw_bytes"] == obj["small"].nbytes + obj["large"].nbytes
+
+
+def test_incompressible_arrays_stay_raw():
+    obj = {"a": np.random.default_rng(0).integers(0, 256, 10000, dtype=np.uint8)}
+    frames = to_frames(obj, codec="zlib", threshold=0)
+    assert json.loads(frames[0])["codecs"] == [None]
+    assert_equal(from_frames(frames), obj)
+
+
+def test_unsupported_codec():
+    with pytest.raises(ValueError):
+        to_frames({"a": np.zeros(3)}, codec="no_such_codec")
@@ -0,0 +1,72 @@
+import gc
+
+import numpy as np
+import pytest
+
+from jupyter_cadquery.serialize import from_frames, to_frames
+from jupyter_cadquery.viewer import shm
+
+pytestmark = pytest.mark.skipif(not shm.available(), reason="multiprocessing.shared_memory not available")
+
+
+@pytest.fixture
+def segments():
+    client, viewer = shm.Segments(), shm.MappedSegments()
+    yield client, viewer
+    client.release()
+
+
+def test_put_below_threshold_stays_inline(segments):
+    client, _ = segments
+    assert client.put(np.zeros(10), threshold=1024) is None
+    assert client.segments == []
+
+
+@pytest.mark.parametrize("shape", [(0,), (0, 3), (0, 2, 3), (5, 0, 3)])
+def test_put_empty_arrays(segments, shape):
+    client, viewer = segments
+    name = client.put(np.empty(shape, dtype=np.float32), threshold=0)
+    assert name is not None
+    assert viewer.attach(name, 0).nbytes == 0
+
+
+def test_round_trip(segments):
+    client, viewer = segments
+    obj = {
+        "vertices": np.arange(30, dtype=np.float32).reshape(-1, 3),
+        "edges": np.empty((0, 2, 3), dtype=np.float32),
+        "triangles": np.arange(9, dtype=np.uint32)[::-1],
+        "normals": np.ones((4, 3))[:, ::2],
+    }
+    frames = to_frames(obj, share=lambda buffer: client.put(buffer, threshold=0))
+    assert all(len(frame) == 0 for frame in frames[1:])
+
+    result = from_frames(frames, attach=viewer.attach)
+    for key, value in obj.items():
+        assert result[key].dtype == value.dtype
+        np.testing.assert_array_equal(result[key], value)
+
+    # segments stay mapped while arrays use them
+    assert viewer.collect() == len(obj)
+    del result
+    # assertion helpers can leave the arrays in reference cycles
+    gc.collect()
+    client.release()
+    assert viewer.collect() == 0
+
+
+def test_shared_refs_need_attach(segments):
+    client, _ = segments
+    frames = to_frames({"a": np.zeros(4)}, share=lambda buffer: client.put(buffer, threshold=0))
+    with pytest.raises(ValueError):
+        from_frames(frames)
+
+
+def test_probe():
+    probe = shm.probe()
+    try:
+        assert shm.check_probe(probe.segments[0].name)
+    finally:
+        probe.release()
+    assert not shm.check_probe(None)
+    assert not shm.check_probe("jcq_no_such_segment")